@@ -3,13 +3,23 @@
 import streamlit as st
 import pandas as pd
 import altair as alt
-import io
 
 from st_aggrid import AgGrid, GridOptionsBuilder, JsCode
 
 # Establishing database connection
 from db_connection_updated import fetch_one
-from db_connection_updated import run_query
+from db_connection_updated import run_queries
+from db_connection_updated import register_statement, run_prepared, data_version
+from profiling import start_rerun, section, render_profile
+from page_queries import (
+    STOCK_POS_COLUMNS, DRILLDOWN_PAGE_SIZE, metrics_query, parse_metrics, drilldown_filters, drilldown_query,
+    PO_DETAILS_SQL, RC_DETAILS_SQL, by_item_code,
+)
+from exports import download_buttons
+from query_metrics_page import ADMIN_PAGE, render_query_metrics_page
+from reference_data import reference_data
+from formatting import date_dd_mmm_yyyy, grid_round, GRID_INDIAN_NUMBER, GRID_PERCENT
+from stock_buckets import ABOVE_3, MID_1_3, BELOW_1, NO_STOCK
 
 
 #######################
@@ -18,110 +28,54 @@ from db_connection_updated import run_query
 if "selected_metric" not in st.session_state:
     st.session_state.selected_metric = "None"
 
-def format_indian_number(number):
-    """Format number with commas as per Indian numbering system"""
-    if number is None or pd.isna(number):
-        return "0"
-
-    try:
-        s = str(int(number))
-    except (ValueError, TypeError):
-        return "0"
-
-    if len(s) <= 3:
-        return s
-
-    # Split last 3 digits
-    last_three = s[-3:]
-    rest = s[:-3]
-
-    # Process rest in reverse, adding comma every 2 digits
-    rest = rest[::-1]
-    chunks = [rest[i:i+2][::-1] for i in range(0, len(rest), 2)]
-    formatted = ','.join(chunks[::-1]) + ',' + last_three
-
-    return formatted
-
-def highlight_low_supply(row):
-    try:
-        supply_pct = float(str(row["Supply %"]).replace("%", "").strip())
-        if supply_pct < 90:
-            color = 'background-color: white; color: red; font-weight: bold;'
-            return [
-                color if col in ["Pending Qty", "Supply %"] else ''
-                for col in row.index
-            ]
-    except:
-        pass
-    return ['' for _ in row]
-
-
-def format_date_dd_mmm_yyyy(date_value):
-    """Format a datetime object or string to 'dd-MMM-yyyy' format."""
-    try:
-        date_obj = pd.to_datetime(date_value)
-        return date_obj.strftime("%d-%b-%Y")
-    except:
-        return ""
-
-def get_metrics():
-    base_query = """
-        SELECT 
-            item_code, 
-            stock_pos_cons, 
-            stock_pos_con_dem, 
-            (SELECT priority_item FROM item_master WHERE item_code = stock_data.item_code) AS priority_item,
-            warehouse_name,
-            stock_quantity
-        FROM stock_data
-        WHERE 1=1
-    """
-    conditions = []
+# Conditional cell styles for the grids, applied in the browser through cellClassRules.
+# AgGrid renders in its own iframe, so the classes are passed as custom_css.
+GRID_CSS = {
+    ".low-supply": {"color": "red !important", "font-weight": "bold !important"},
+    ".rc-not-available": {"color": "red !important"},
+}
+# Compared after rounding, as displayed: 89.6% shows as 90% and is not low
+LOW_SUPPLY_RULE = {"low-supply": grid_round("(data['Supply %'] || 0)") + " < 90"}
+RC_NOT_AVAILABLE_RULE = {"rc-not-available": "x == 'Not Avl'"}
+
 
-    # Apply drug type filter
-    if selected_category == "Priority Drugs":
-        conditions.append("item_code IN (SELECT item_code FROM item_master WHERE priority_item = 'Yes')")
+# Metric tile -> stock bucket shown in its drill-down list
+TILE_BUCKETS = {"t_above_3": ABOVE_3, "t_mid_1_3": MID_1_3, "t_below_1": BELOW_1, "t_zero": NO_STOCK}
 
-    # Apply warehouse filter
-    if selected_cms != "State Total":
-        conditions.append(f"warehouse_name = '{selected_cms}'")
-    else:
-        conditions.append("warehouse_name = 'State Total'")
 
-    # Choose the appropriate stock column
-    if selected_cons_ref == "Only Consumption":
-        stock_col = "stock_pos_cons"
-    else:
-        stock_col = "stock_pos_con_dem"
+def _select_metric(key):
+    # Runs before the rerun, so the drill-down query is known before the tiles are drawn
+    st.session_state.selected_metric = key
 
-    # Final query
-    final_query = f"{base_query} AND {' AND '.join(conditions)};"
-    data = run_query(final_query)
 
-    # Build DataFrame
-    df = pd.DataFrame(data, columns=[
-        "item_code", "stock_pos_cons", "stock_pos_con_dem", "priority_item", "warehouse_name", "stock_quantity"
-    ])
-    if df.empty:
-        return 0, 0, 0, 0, 0
+def _next_page(last_item_code):
+    st.session_state.drilldown_pages.append(last_item_code)
 
-    # Choose relevant stock position column
-    df["stock_pos"] = df[stock_col].fillna(0)
-    df["stock_quantity"] = df["stock_quantity"].fillna(0)
 
-    # Metrics
-    total = df["item_code"].nunique()
-    above_3 = df[df["stock_pos"] > 3].shape[0]
-    mid_1_3 = df[(df["stock_pos"] > 1) & (df["stock_pos"] <= 3)].shape[0]
-    below_1 = df[(df["stock_pos"] <= 1) & (df["stock_pos"] > 0)].shape[0]
+def _previous_page():
+    st.session_state.drilldown_pages.pop()
 
-    # Only consider as zero if both stock_pos = 0 AND stock_quantity = 0
-    zero = df[(df["stock_pos"] == 0) & (df["stock_quantity"] == 0)].shape[0]
 
-    # Adjust below_1 to include those with stock_pos = 0 but stock_quantity > 0
-    below_1 += df[(df["stock_pos"] == 0) & (df["stock_quantity"] > 0)].shape[0]
+# PO and RC details for every item of a drill-down page in one round trip each,
+# prepared once per pooled connection
+register_statement("po_details", PO_DETAILS_SQL, ["text[]"])
+register_statement("rc_details", RC_DETAILS_SQL, ["text[]"])
 
-    return total, above_3, mid_1_3, below_1, zero
+
+def prefetch_details(item_codes):
+    """PO and RC rows of the listed items as two dicts keyed by item code.
+
+    Kept in session_state per data version and page, so selecting a row
+    is a dictionary lookup rather than a query.
+    """
+    key = (data_version(), tuple(item_codes))
+    cached = st.session_state.get("drilldown_details")
+    if cached is None or cached[0] != key:
+        po = run_prepared("po_details", [list(item_codes)])
+        rc = run_prepared("rc_details", [list(item_codes)])
+        cached = (key, by_item_code(po), by_item_code(rc))
+        st.session_state.drilldown_details = cached
+    return cached[1], cached[2]
 
 
 #######################
@@ -132,6 +86,14 @@ st.set_page_config(
     layout="wide",
     initial_sidebar_state="expanded")
 
+# The admin-only Query Metrics view has no sidebar entry; ?admin=query-metrics opens it here
+if st.query_params.get("admin") == ADMIN_PAGE:
+    start_rerun("Query Metrics")
+    render_query_metrics_page()
+    st.stop()
+
+start_rerun("Dashboard")
+
 
 alt.themes.enable("dark")
 
@@ -251,13 +213,12 @@ def clickable_metric(label, value, color, key):
         """, unsafe_allow_html=True)
         
         # Invisible submit button to capture the click
-        if st.form_submit_button(label="View list", use_container_width=True):
-            st.session_state.selected_metric = key
+        st.form_submit_button(label="View list", use_container_width=True, on_click=_select_metric, args=(key,))
 
 
 #######################
 # Sidebar
-with st.sidebar:
+with st.sidebar, section("sidebar"):
     st.title('Custom Options')
     
     cons_ref = ['Consumption/Demand', 'Only Consumption']
@@ -266,9 +227,7 @@ with st.sidebar:
     options_list = ['All Drugs', 'Priority Drugs']
     selected_category = st.selectbox('Select Drugs', options_list)  
 
-    cms_query = "SELECT DISTINCT warehouse_name FROM stock_data ORDER BY warehouse_name"
-    cms_result = run_query(cms_query)  # assuming run_query returns a list of tuples or a DataFrame
-    cms_list = cms_result['warehouse_name'].tolist()
+    cms_list = reference_data().warehouses.tolist()
     cms_list.insert(0, "State Total")  # Add manually to top
     selected_cms = st.selectbox('Select CMS', cms_list)
 
@@ -282,256 +241,233 @@ st.markdown("<br>", unsafe_allow_html=True)
 
 st.markdown('### Stock Position of Drugs')
 
-# Layout of metric blocks
-total_drugs, above_3, mid_1_3, below_1, zero = get_metrics()
+# The tile counts and the drill-down page are independent queries and run
+# concurrently. All sidebar combinations of the tile counts come back from
+# one query, so switching the selectboxes is answered from the result cache.
+batch = {"metrics": (metrics_query(), [selected_cms])}
 
-col1, col2, col3, col4, col5 = st.columns(5)
+if st.session_state.selected_metric != "None":
 
-with col1:
-    clickable_metric("Total Drugs", str(total_drugs), "#E5E4E2", "t_all")
+    # Decide which stock position to use
+    stock_pos_col = STOCK_POS_COLUMNS[selected_cons_ref]
 
-with col2:
-    clickable_metric("> 3 months", str(above_3), "#90EE90", "t_above_3")
+    # Filters
+    bucket = TILE_BUCKETS.get(st.session_state.selected_metric)
+    filters = drilldown_filters(selected_cms, stock_pos_col, selected_category, bucket)
 
-with col3:
-    clickable_metric("1-3 Months", str(mid_1_3), "#FFFACD", "t_mid_1_3")
+    # Start key of every page visited so far; back to page one whenever the list changes
+    list_key = (selected_cms, selected_cons_ref, selected_category, st.session_state.selected_metric)
+    if st.session_state.get("drilldown_key") != list_key:
+        st.session_state.drilldown_key = list_key
+        st.session_state.drilldown_pages = [None]
+    pages = st.session_state.drilldown_pages
 
-with col4:
-    clickable_metric("< 1 Month", str(below_1), "#FFD6D6", "t_below_1")
+    # One row more than a page tells whether there is a next page
+    page_query, page_params = drilldown_query(
+        stock_pos_col, filters, after=pages[-1], limit=DRILLDOWN_PAGE_SIZE + 1, item_attributes=False
+    )
+    batch["drilldown_page"] = (page_query, page_params)
 
-with col5:
-    clickable_metric("Zero Stock", str(zero), "#FF7F7F", "t_zero")
+with section("queries"):
+    results = run_queries(batch)
 
-if st.session_state.selected_metric != "None":
+# Layout of metric blocks
+with section("metric tiles"):
+    # Tile counts keyed by (reference quantity, drug category)
+    metrics = parse_metrics(results["metrics"].iloc[0])
+    total_drugs, above_3, mid_1_3, below_1, zero = metrics[(selected_cons_ref, selected_category)]
 
-    # Decide which stock position to use
-    stock_pos_col = "stock_pos_cons" if selected_cons_ref == "Only Consumption" else "stock_pos_con_dem"
-
-    # Base query with subqueries
-    base_query = f'''
-        SELECT 
-            ROW_NUMBER() OVER () as "S No.", 
-            a.item_code as "Item Code", 
-            (SELECT item_name FROM item_master WHERE item_code = a.item_code) as "Item Name", 
-            (SELECT eml_aml_type FROM item_master WHERE item_code = a.item_code) as "EML/AML", 
-            (SELECT priority_item FROM item_master WHERE item_code = a.item_code) as "Priority Status",
-            (SELECT type_cons_dem FROM item_master WHERE item_code = a.item_code) as "Cons/Dem Type",
-            SUM(COALESCE(stock_quantity, 0)) as "Stock Qty",
-            ROUND(AVG(COALESCE(a.{stock_pos_col}, 0)), 2) as "Stock Position",
-            (SELECT (SUM(COALESCE(po_qty,0)) - SUM(COALESCE(received_qty,0))) 
-             FROM purchase_order_data 
-             WHERE item_code = a.item_code) as "Pending Supply",
-            CASE 
-                WHEN rc.item_code IS NOT NULL THEN 'Avl'
-                ELSE 'Not Avl'
-            END as "RC Status"
-        FROM stock_data a
-        LEFT JOIN rate_contract_data rc ON rc.item_code = a.item_code
-        WHERE 1=1
-    '''
+    col1, col2, col3, col4, col5 = st.columns(5)
 
-    # Filters
-    filters = []
-
-    if selected_category == "Priority Drugs":
-        filters.append("a.item_code IN (SELECT item_code FROM item_master WHERE priority_item = 'Yes')")
-
-    if selected_cms != "State Total":
-        filters.append(f"a.warehouse_name = '{selected_cms}'")
-    else:
-        filters.append("a.warehouse_name = 'State Total'")
-
-    # Metric filter logic (based on stock position)
-    if st.session_state.selected_metric == "t_above_3":
-        st.write("**Showing drugs with stock > 3 months**")
-        filters.append(f"COALESCE({stock_pos_col}, 0) > 3")
-    elif st.session_state.selected_metric == "t_mid_1_3":
-        st.write("**Showing drugs with stock between 1 and 3 months**")
-        filters.append(f"COALESCE({stock_pos_col}, 0) > 1 AND COALESCE({stock_pos_col}, 0) <= 3")
-    elif st.session_state.selected_metric == "t_below_1":
-        st.write("**Showing drugs with stock < 1 month**")
-        filters.append(f"(({stock_pos_col} > 0 AND {stock_pos_col} <= 1) OR ((COALESCE(stock_quantity, 0)) > 0 AND COALESCE({stock_pos_col}, 0) = 0))")
-    elif st.session_state.selected_metric == "t_zero":
-        st.write("**Showing drugs with zero stock position**")
-        filters.append("(COALESCE(stock_quantity, 0)) = 0")
-    else:
-        st.write("**Showing all drugs**")
-
-    # Combine the filters
-    if filters:
-        base_query += " AND " + " AND ".join(filters)
-
-    # Grouping
-    base_query += " GROUP BY a.item_code, rc.item_code"
-
-    # Final query
-    final_query = base_query + ";"
-
-    # Fetch data
-    data = run_query(final_query)
-
-    # Display table
-    if not data.empty:
-        df = pd.DataFrame(data, columns=[
-            "S No.", "Item Code", "Item Name", "EML/AML", "Priority Status",
-            "Cons/Dem Type", "Stock Qty", "Stock Position", "Pending Supply",
-            "RC Status"
-        ])
-
-        # Format number columns (keep numeric types for AgGrid)
-        df["Stock Qty"] = pd.to_numeric(df["Stock Qty"], errors="coerce").fillna(0)
-        df["Stock Position"] = pd.to_numeric(df["Stock Position"], errors="coerce").fillna(0)
-        df["Pending Supply"] = pd.to_numeric(df["Pending Supply"], errors="coerce").fillna(0)
-
-        # Build AgGrid config
-        gb = GridOptionsBuilder.from_dataframe(df)
-
-        gb.configure_default_column(sortable=True, resizable=True, filter=False, wrapHeaderText=True, autoHeaderHeight=True)
-        gb.configure_column("Item Code", filter=True)
-        gb.configure_column("S No.", width = 100, filter=False)
-        gb.configure_column("Item Name", filter=True, width = 500)
-        gb.configure_column("Stock Qty", type=["numericColumn", "customNumericFormat"], precision=0, valueFormatter="x.toLocaleString()")
-        gb.configure_column("Pending Supply", type=["numericColumn", "customNumericFormat"], precision=0, valueFormatter="x.toLocaleString()")
-        gb.configure_column("Stock Position", type=["numericColumn", "customNumericFormat"], precision=2, valueFormatter="x.toLocaleString()")
-        gb.configure_selection(selection_mode="single", use_checkbox=False)
-        gb.configure_grid_options(floatingFilter=False)
-
-        rc_cellstyle = {'styleConditions': [
-            {'condition': "params.value == 'Not Avl'", 'style': {'color': 'red'}}
-        ]}
-
-        gb.configure_column("RC Status", filter=False)
-
-        grid_options = gb.build()
-
-        # Render table
-        grid_response = AgGrid(
-            df,
-            gridOptions=grid_options,
-            height=350,
-            width='100%',
-            enable_enterprise_modules=False,
-            fit_columns_on_grid_load=True,
-            theme = "blue"
-        )
-
-        # Download Table Button
-        # Convert to CSV
-        csv_buffer = io.StringIO()
-        df.to_csv(csv_buffer, index=False)
-        csv_data = csv_buffer.getvalue()
-
-        col1, col2 = st.columns([4,1])
-
-        with col2:
-                st.download_button(
-                    label="⬇️ Download CSV",
-                    data=csv_data,
-                    file_name="filtered_data.csv",
-                    mime="text/csv",
-                    use_container_width=True
-                )
+    with col1:
+        clickable_metric("Total Drugs", str(total_drugs), "#E5E4E2", "t_all")
 
-    else:
-        st.warning("No records found for the selected filters.")
+    with col2:
+        clickable_metric("> 3 months", str(above_3), "#90EE90", "t_above_3")
 
+    with col3:
+        clickable_metric("1-3 Months", str(mid_1_3), "#FFFACD", "t_mid_1_3")
 
-    # Access selected row (if needed)
-    selected = grid_response['selected_rows']
+    with col4:
+        clickable_metric("< 1 Month", str(below_1), "#FFD6D6", "t_below_1")
 
-    if selected is not None and len(selected) > 0:
-        selected_row = selected.iloc[0]
-        item_code = selected_row["Item Code"]
-        item_name = selected_row["Item Name"]
-        
-        st.markdown(
-            f'<span style="color:black; font-weight:bold;">Showing PO Details for:</span> {item_name}',
-            unsafe_allow_html=True
-        )
-
-        # Query
-        detail_query = f"""
-        SELECT 
-        ROW_NUMBER() OVER () as "S No.", 
-        po_number as "PO No.",
-        po_date as "PO Date",
-        supplier as "Supplier Name",
-        po_qty as "PO Qty",
-        received_qty as "Received Qty",
-        supply_status as "Supply %",
-        (po_qty - received_qty) as "Pending Qty",
-        scheduled_delivery_date as "Scheduled Delivery Date"                
-        FROM purchase_order_data 
-        WHERE item_code = '{item_code}'
-        ORDER BY po_date DESC
-        """
-        po_data = run_query(detail_query)
-
-        # df["PO Date"] = pd.to_datetime(df["PO Date"]).dt.strftime("%d-%b-%Y")
-
-        if not po_data.empty:
-            po_df = pd.DataFrame(po_data, columns=[
-                "S No.", "PO No.","PO Date", "Supplier Name",
-                "PO Qty", "Received Qty", "Supply %", "Pending Qty", "Scheduled Delivery Date"
-            ])
+    with col5:
+        clickable_metric("Zero Stock", str(zero), "#FF7F7F", "t_zero")
 
-            # Format Dates
-            for col in ["PO Date", "Scheduled Delivery Date"]:
-                po_df[col] = po_df[col].apply(format_date_dd_mmm_yyyy)
+with section("drill-down"):
+    if st.session_state.selected_metric != "None":
 
-            for col in ["PO Qty", "Received Qty", "Pending Qty"]:
-                po_df[col] = po_df[col].apply(format_indian_number)
+        # Metric filter logic (based on stock position)
+        bucket_messages = {
+            ABOVE_3: "**Showing drugs with stock > 3 months**",
+            MID_1_3: "**Showing drugs with stock between 1 and 3 months**",
+            BELOW_1: "**Showing drugs with stock < 1 month**",
+            NO_STOCK: "**Showing drugs with zero stock position**",
+        }
+        if bucket is not None:
+            st.write(bucket_messages[bucket])
+        else:
+            st.write("**Showing all drugs**")
 
-            po_df["Supply %"] = po_df["Supply %"].apply(lambda x: f"{int(round(x))}%" if pd.notnull(x) else "0%")
+        data = results["drilldown_page"]
+        has_next = len(data) > DRILLDOWN_PAGE_SIZE
+        data = reference_data().join_items(data.iloc[:DRILLDOWN_PAGE_SIZE])
 
-            po_df = po_df.set_index('S No.')
+        grid_response = None
 
-            styled_df = po_df.style.apply(highlight_low_supply, axis=1)
-            st.write(styled_df, index=False)
+        # Display table
+        if not data.empty:
+            first_row = (len(pages) - 1) * DRILLDOWN_PAGE_SIZE + 1
+            df = pd.DataFrame(data, columns=[
+                "S No.", "Item Code", "Item Name", "EML/AML", "Priority Status",
+                "Cons/Dem Type", "Stock Qty", "Stock Position", "Pending Supply",
+                "RC Status"
+            ])
+            df["S No."] += first_row - 1
+
+            # Format number columns (keep numeric types for AgGrid)
+            df["Stock Qty"] = pd.to_numeric(df["Stock Qty"], errors="coerce").fillna(0)
+            df["Stock Position"] = pd.to_numeric(df["Stock Position"], errors="coerce").fillna(0)
+            df["Pending Supply"] = pd.to_numeric(df["Pending Supply"], errors="coerce").fillna(0)
+
+            # Build AgGrid config
+            gb = GridOptionsBuilder.from_dataframe(df)
+
+            gb.configure_default_column(sortable=True, resizable=True, filter=False, wrapHeaderText=True, autoHeaderHeight=True)
+            gb.configure_column("Item Code", filter=True)
+            gb.configure_column("S No.", width = 100, filter=False)
+            gb.configure_column("Item Name", filter=True, width = 500)
+            gb.configure_column("Stock Qty", type=["numericColumn", "customNumericFormat"], precision=0, valueFormatter="x.toLocaleString()")
+            gb.configure_column("Pending Supply", type=["numericColumn", "customNumericFormat"], precision=0, valueFormatter="x.toLocaleString()")
+            gb.configure_column("Stock Position", type=["numericColumn", "customNumericFormat"], precision=2, valueFormatter="x.toLocaleString()")
+            gb.configure_selection(selection_mode="single", use_checkbox=False)
+            gb.configure_grid_options(floatingFilter=False)
+
+            gb.configure_column("RC Status", filter=False, cellClassRules=RC_NOT_AVAILABLE_RULE)
+
+            grid_options = gb.build()
+
+            with section("PO/RC prefetch"):
+                po_by_item, rc_by_item = prefetch_details(df["Item Code"])
+
+            # Render table
+            grid_response = AgGrid(
+                df,
+                gridOptions=grid_options,
+                height=350,
+                width='100%',
+                enable_enterprise_modules=False,
+                fit_columns_on_grid_load=True,
+                theme = "blue",
+                custom_css=GRID_CSS
+            )
+
+            col1, col2, col3, col4 = st.columns([1, 3, 1, 1])
+
+            with col1:
+                st.button("◀ Previous", disabled=len(pages) == 1, on_click=_previous_page,
+                          use_container_width=True)
+
+            with col2:
+                st.caption(f"Rows {first_row:,}–{first_row + len(df) - 1:,}")
+
+            with col3:
+                st.button("Next ▶", disabled=not has_next, on_click=_next_page,
+                          args=(df["Item Code"].iloc[-1],), use_container_width=True)
+
+            # Download Table Button
+            # The whole list, built only when a download is asked for
+            with col4, section("export"):
+                download_buttons(*drilldown_query(stock_pos_col, filters), "filtered_data", key="drilldown_export")
 
         else:
-            st.info("No purchase orders found for this item.")
-
-
-        st.markdown("<br>", unsafe_allow_html=True)
-        st.markdown(
-            f'<span style="color:black; font-weight:bold;">Showing RC Details for:</span> {item_name}',
-            unsafe_allow_html=True
-        )
-
-        # Query
-        detail_rc_query = f"""
-        SELECT 
-        ROW_NUMBER() OVER (ORDER BY contract_to_date DESC, rate_contract_level ASC) as "S No.", 
-        supplier as "Supplier Name",
-        rate as "Rate",
-        rate_unit as "Rate Unit",
-        tender_date as "Tender Date",
-        contract_from_date as "RC Start Date",
-        contract_to_date as "RC End Date",
-        rate_contract_level as "Bid Level"                
-        FROM rate_contract_data 
-        WHERE item_code = '{item_code}'
-        ORDER BY contract_to_date DESC, rate_contract_level ASC
-        """
-        rc_data = run_query(detail_rc_query)
-
-        if not rc_data.empty:
-            rc_df = pd.DataFrame(rc_data, columns=[
-                "S No.","Supplier Name", "Rate", "Rate Unit",
-                "Tender Date", "RC Start Date", "RC End Date", "Bid Level"
-            ])
+            st.warning("No records found for the selected filters.")
 
-            # Format Dates
-            for col in ["Tender Date", "RC Start Date", "RC End Date"]:
-                rc_df[col] = rc_df[col].apply(format_date_dd_mmm_yyyy)
 
-            st.dataframe(rc_df, hide_index=True)
+        # Access selected row (if needed)
+        selected = grid_response['selected_rows'] if grid_response is not None else None
 
-        else:
-            st.info("No active rate contracts found for this item.")
+        if selected is not None and len(selected) > 0:
+            selected_row = selected.iloc[0]
+            item_code = selected_row["Item Code"]
+            item_name = selected_row["Item Name"]
+        
+            with section("PO details"):
+                st.markdown(
+                    f'<span style="color:black; font-weight:bold;">Showing PO Details for:</span> {item_name}',
+                    unsafe_allow_html=True
+                )
+
+                # Prefetched with the list page
+                po_data = po_by_item.get(item_code, pd.DataFrame())
+
+                # df["PO Date"] = pd.to_datetime(df["PO Date"]).dt.strftime("%d-%b-%Y")
+
+                if not po_data.empty:
+                    po_df = pd.DataFrame(po_data, columns=[
+                        "S No.", "PO No.","PO Date", "Supplier Name",
+                        "PO Qty", "Received Qty", "Supply %", "Pending Qty", "Scheduled Delivery Date"
+                    ])
+
+                    # Format Dates
+                    for col in ["PO Date", "Scheduled Delivery Date"]:
+                        po_df[col] = date_dd_mmm_yyyy(po_df[col])
+
+                    # Quantities and Supply % stay numeric; the grid formats and highlights them
+                    for col in ["PO Qty", "Received Qty", "Pending Qty", "Supply %"]:
+                        po_df[col] = pd.to_numeric(po_df[col], errors="coerce")
+
+                    po_gb = GridOptionsBuilder.from_dataframe(po_df)
+                    po_gb.configure_default_column(sortable=True, resizable=True, filter=False, wrapHeaderText=True, autoHeaderHeight=True)
+                    po_gb.configure_column("S No.", width=80)
+                    po_gb.configure_column("Supplier Name", width=300)
+                    for col in ["PO Qty", "Received Qty"]:
+                        po_gb.configure_column(col, type=["numericColumn"], valueFormatter=GRID_INDIAN_NUMBER)
+                    po_gb.configure_column("Pending Qty", type=["numericColumn"], valueFormatter=GRID_INDIAN_NUMBER,
+                                           cellClassRules=LOW_SUPPLY_RULE)
+                    po_gb.configure_column("Supply %", type=["numericColumn"], valueFormatter=GRID_PERCENT,
+                                           cellClassRules=LOW_SUPPLY_RULE)
+
+                    AgGrid(
+                        po_df,
+                        gridOptions=po_gb.build(),
+                        height=min(350, 60 + 30 * len(po_df)),
+                        width='100%',
+                        enable_enterprise_modules=False,
+                        fit_columns_on_grid_load=True,
+                        theme="blue",
+                        custom_css=GRID_CSS,
+                        key="po_details_grid"
+                    )
+
+                else:
+                    st.info("No purchase orders found for this item.")
+
+
+            with section("RC details"):
+                st.markdown("<br>", unsafe_allow_html=True)
+                st.markdown(
+                    f'<span style="color:black; font-weight:bold;">Showing RC Details for:</span> {item_name}',
+                    unsafe_allow_html=True
+                )
+
+                # Prefetched with the list page
+                rc_data = rc_by_item.get(item_code, pd.DataFrame())
+
+                if not rc_data.empty:
+                    rc_df = pd.DataFrame(rc_data, columns=[
+                        "S No.","Supplier Name", "Rate", "Rate Unit",
+                        "Tender Date", "RC Start Date", "RC End Date", "Bid Level"
+                    ])
 
+                    # Format Dates
+                    for col in ["Tender Date", "RC Start Date", "RC End Date"]:
+                        rc_df[col] = date_dd_mmm_yyyy(rc_df[col])
 
+                    st.dataframe(rc_df, hide_index=True)
 
+                else:
+                    st.info("No active rate contracts found for this item.")
 
 
+render_profile()
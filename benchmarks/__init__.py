@@ -0,0 +1,3 @@
+# Performance benchmarks. Run from the repository root, e.g.
+#   python -m benchmarks.bench_formatting
+#   python -m benchmarks.run --dsn postgresql://localhost/scratch
@@ -0,0 +1,69 @@
+"""Per-cell date formatting vs. the vectorized formatting module.
+
+Quantities and Supply % are formatted by the grid in the browser, so only
+the date columns are still formatted in Python.
+
+    python -m benchmarks.bench_formatting [--rows 200000] [--repeat 5]
+"""
+import argparse
+import time
+
+import numpy as np
+import pandas as pd
+
+from formatting import date_dd_mmm_yyyy
+
+
+def make_frame(n_rows, seed=0):
+    # A long PO history: PO dates, some missing
+    rng = np.random.default_rng(seed)
+    dates = pd.Timestamp("2020-01-01") + pd.to_timedelta(rng.integers(0, 2000, n_rows), unit="D")
+    date = pd.Series(dates.date, dtype=object)
+    date[rng.random(n_rows) < 0.05] = None
+    return pd.DataFrame({"date": date})
+
+
+# The Dashboard helper before the formatting module
+def format_date_dd_mmm_yyyy(date_value):
+    try:
+        return pd.to_datetime(date_value).strftime("%d-%b-%Y")
+    except Exception:
+        return ""
+
+
+def legacy(df):
+    return df["date"].apply(format_date_dd_mmm_yyyy)
+
+
+def vectorized(df):
+    return date_dd_mmm_yyyy(df["date"])
+
+
+def best_of(fn, df, repeat):
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn(df)
+        timings.append(time.perf_counter() - start)
+    return min(timings)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--rows", type=int, default=200_000)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    df = make_frame(args.rows)
+    print(f"{len(df):,} rows")
+
+    assert legacy(df).equals(vectorized(df)), "outputs differ"
+
+    legacy_s = best_of(legacy, df, 1)
+    vector_s = best_of(vectorized, df, args.repeat)
+    print(f"per-cell apply helpers: {legacy_s * 1000:10.1f} ms")
+    print(f"formatting module:      {vector_s * 1000:10.1f} ms  ({legacy_s / vector_s:,.0f}x)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,221 @@
+"""What each page does per rerun, as benchmark cases.
+
+Every case runs a page's queries (from page_queries) against the benchmark
+schema, followed by the pandas work the page does on the result. Cases take
+a connection and the Context built once per run. The "*.page" cases run a
+page's query batch concurrently, as run_queries does in the app.
+"""
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from datetime import date, timedelta
+
+import pandas as pd
+
+from benchmarks.database import connect
+from benchmarks.synthetic import STATE_TOTAL, as_upload
+from db_summaries import refresh_summaries
+from formatting import date_dd_mmm_yyyy
+from ingest import CHUNK_ROWS, DELTA, REPLACE, ingest
+from page_queries import (
+    DRILLDOWN_PAGE_SIZE, LOW_STOCK_NO_SUPPLY_QUERY, PO_DETAILS_SQL, RC_COUNTS_QUERY, RC_DETAILS_SQL, STOCK_POS_COLUMNS,
+    by_item_code, distribution_query, drilldown_filters, drilldown_query, expiring_rc_query,
+    metrics_query, no_rc_query, parse_metrics, zero_stock_query,
+)
+from reference_data import load_reference_data
+from stock_buckets import BELOW_1
+from upload_schemas import DATASETS
+
+# Largest query batch a page runs per rerun
+BATCH_CONNECTIONS = 2
+
+
+@dataclass
+class Context:
+    tables: dict            # synthetic frames, by table name
+    cms: str                # a regular CMS for the per-CMS queries
+    reference: object       # ReferenceData loaded from the benchmark schema
+    connections: list       # one per query of a batch, like the app's pool
+    executor: object        # ThreadPoolExecutor running the batches
+
+
+def make_context(conn, tables, dsn):
+    cms = sorted(set(tables["stock_data"]["warehouse_name"]) - {STATE_TOTAL})[0]
+    return Context(
+        tables=tables,
+        cms=cms,
+        reference=load_reference_data(conn),
+        connections=[connect(dsn) for _ in range(BATCH_CONNECTIONS)],
+        executor=ThreadPoolExecutor(max_workers=BATCH_CONNECTIONS),
+    )
+
+
+def close_context(ctx):
+    ctx.executor.shutdown()
+    for conn in ctx.connections:
+        conn.close()
+
+
+def _read(conn, query, params=None):
+    return pd.read_sql(query, conn, params=params)
+
+
+def _read_and_end(conn, query, params):
+    try:
+        return _read(conn, query, params)
+    finally:
+        conn.rollback()
+
+
+def _read_batch(ctx, queries):
+    """{name: (query, params)} -> {name: DataFrame}, each query on its own connection, concurrently."""
+    futures = {
+        name: ctx.executor.submit(_read_and_end, conn, query, params)
+        for conn, (name, (query, params)) in zip(ctx.connections, queries.items())
+    }
+    return {name: future.result() for name, future in futures.items()}
+
+
+def _positional(sql):
+    """A registered $1 statement as a psycopg2 %s query."""
+    return sql.replace("%", "%%").replace("$1", "%s")
+
+
+# Dashboard
+
+def dashboard_metrics(conn, ctx):
+    parse_metrics(_read(conn, metrics_query(), [ctx.cms]).iloc[0])
+
+
+def dashboard_page(conn, ctx):
+    # A rerun with the "<1 month" tile selected: tile counts and the first
+    # drill-down page in one batch
+    stock_pos_col = STOCK_POS_COLUMNS["Consumption/Demand"]
+    filters = drilldown_filters(ctx.cms, stock_pos_col, "All Drugs", BELOW_1)
+    results = _read_batch(ctx, {
+        "metrics": (metrics_query(), [ctx.cms]),
+        "drilldown_page": drilldown_query(
+            stock_pos_col, filters, limit=DRILLDOWN_PAGE_SIZE + 1, item_attributes=False
+        ),
+    })
+    parse_metrics(results["metrics"].iloc[0])
+    ctx.reference.join_items(results["drilldown_page"].iloc[:DRILLDOWN_PAGE_SIZE])
+
+
+def dashboard_drilldown_page(conn, ctx):
+    stock_pos_col = STOCK_POS_COLUMNS["Consumption/Demand"]
+    filters = drilldown_filters(ctx.cms, stock_pos_col, "All Drugs")
+    query, params = drilldown_query(stock_pos_col, filters, limit=DRILLDOWN_PAGE_SIZE + 1, item_attributes=False)
+    ctx.reference.join_items(_read(conn, query, params).iloc[:DRILLDOWN_PAGE_SIZE])
+
+
+def dashboard_drilldown_full(conn, ctx):
+    # The whole "Total Drugs" list, as an export reads it
+    stock_pos_col = STOCK_POS_COLUMNS["Consumption/Demand"]
+    _read(conn, *drilldown_query(stock_pos_col, drilldown_filters(ctx.cms, stock_pos_col, "All Drugs")))
+
+
+def dashboard_details(conn, ctx):
+    codes = list(ctx.reference.items.index[:DRILLDOWN_PAGE_SIZE])
+    po = by_item_code(_read(conn, _positional(PO_DETAILS_SQL), [codes]))
+    by_item_code(_read(conn, _positional(RC_DETAILS_SQL), [codes]))
+    # What the PO grid does before AgGrid formats the numbers client-side
+    for po_df in po.values():
+        for column in ["PO Date", "Scheduled Delivery Date"]:
+            date_dd_mmm_yyyy(po_df[column])
+        for column in ["PO Qty", "Received Qty", "Pending Qty", "Supply %"]:
+            pd.to_numeric(po_df[column], errors="coerce")
+
+
+# Insights
+
+def insights_counts(conn, ctx):
+    _read(conn, RC_COUNTS_QUERY, {"expiry_cutoff": date.today() + timedelta(days=90)})
+
+
+def insights_expiring(conn, ctx):
+    _read(conn, expiring_rc_query(priority_only=False))
+
+
+def insights_no_rc(conn, ctx):
+    _read(conn, no_rc_query(priority_only=False))
+
+
+def insights_low_stock(conn, ctx):
+    _read(conn, LOW_STOCK_NO_SUPPLY_QUERY)
+
+
+# Distribution across state
+
+def distribution_chart(conn, ctx):
+    _read(conn, distribution_query("Zero Stock Items"), ["con_dem", "all"])
+
+
+def distribution_zero_stock(conn, ctx):
+    _read(conn, *zero_stock_query(ctx.cms, priority_only=False))
+
+
+def distribution_page(conn, ctx):
+    # A rerun with a CMS selected: the chart counts and its zero stock list in one batch
+    _read_batch(ctx, {
+        "distribution_chart": (distribution_query("Zero Stock Items"), ["con_dem", "all"]),
+        "zero_stock": zero_stock_query(ctx.cms, priority_only=False),
+    })
+
+
+# Uploads, each rolled back so every repeat starts from the same data
+
+def _chunks(df):
+    for start in range(0, len(df), CHUNK_ROWS):
+        yield df.iloc[start:start + CHUNK_ROWS]
+
+
+def _upload(conn, ctx, key, mode):
+    dataset = DATASETS[key]
+    upload = as_upload(dataset, ctx.tables[dataset.table])
+    try:
+        with conn.cursor() as cur:
+            result = ingest(cur, dataset, _chunks(upload), {}, mode=mode)
+            if result.has_changes:
+                refresh_summaries(cur)
+    finally:
+        conn.rollback()
+
+
+def upload_stock_replace(conn, ctx):
+    _upload(conn, ctx, "stock", REPLACE)
+
+
+def upload_stock_delta(conn, ctx):
+    _upload(conn, ctx, "stock", DELTA)
+
+
+def upload_po_replace(conn, ctx):
+    _upload(conn, ctx, "po", REPLACE)
+
+
+def summaries_refresh(conn, ctx):
+    try:
+        with conn.cursor() as cur:
+            refresh_summaries(cur)
+    finally:
+        conn.rollback()
+
+
+CASES = {
+    "dashboard.metrics": dashboard_metrics,
+    "dashboard.page": dashboard_page,
+    "dashboard.drilldown_page": dashboard_drilldown_page,
+    "dashboard.drilldown_full": dashboard_drilldown_full,
+    "dashboard.details": dashboard_details,
+    "insights.counts": insights_counts,
+    "insights.expiring": insights_expiring,
+    "insights.no_rc": insights_no_rc,
+    "insights.low_stock": insights_low_stock,
+    "distribution.chart": distribution_chart,
+    "distribution.zero_stock": distribution_zero_stock,
+    "distribution.page": distribution_page,
+    "upload.stock_replace": upload_stock_replace,
+    "upload.stock_delta": upload_stock_delta,
+    "upload.po_replace": upload_po_replace,
+    "summaries.refresh": summaries_refresh,
+}
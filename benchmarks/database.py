@@ -0,0 +1,71 @@
+"""Throwaway benchmark database: base tables, migrations and synthetic data.
+
+Everything lives in its own schema (BENCH_SCHEMA) on the server given by
+--dsn, which is dropped and recreated on every load, so the benchmarks
+never touch the application's tables.
+"""
+import io
+
+import psycopg2
+
+from db_migrations import apply_migrations
+from db_summaries import refresh_summaries
+from upload_schemas import DATASETS
+
+BENCH_SCHEMA = "dashboard_bench"
+
+SQL_TYPES = {"text": "text", "code": "text", "int": "integer", "float": "numeric", "date": "date"}
+
+ITEM_MASTER_DDL = """
+    CREATE TABLE item_master (
+        item_code       text PRIMARY KEY,
+        item_name       text,
+        eml_aml_type    text,
+        type_cons_dem   text,
+        priority_item   text
+    )
+"""
+
+
+def base_tables_ddl():
+    """CREATE TABLE for item_master and every upload table, from upload_schemas."""
+    statements = [ITEM_MASTER_DDL]
+    for dataset in DATASETS.values():
+        columns = [f"{column.target} {SQL_TYPES[column.kind]}" for column in dataset.columns]
+        if dataset.table == "stock_data":
+            columns += ["stock_pos_cons numeric", "stock_pos_con_dem numeric"]
+        statements.append(f"CREATE TABLE {dataset.table} ({', '.join(columns)})")
+    return statements
+
+
+def connect(dsn):
+    """Connection whose search_path points at the benchmark schema."""
+    return psycopg2.connect(dsn, options=f"-c search_path={BENCH_SCHEMA}")
+
+
+def _copy(cur, table, df):
+    buffer = io.StringIO()
+    df.to_csv(buffer, index=False, header=False)
+    buffer.seek(0)
+    cur.copy_expert(f"COPY {table} ({', '.join(df.columns)}) FROM STDIN WITH (FORMAT csv)", buffer)
+
+
+def load(conn, tables):
+    """Recreate the benchmark schema and load the generate() frames into it."""
+    with conn.cursor() as cur:
+        cur.execute(f"DROP SCHEMA IF EXISTS {BENCH_SCHEMA} CASCADE")
+        cur.execute(f"CREATE SCHEMA {BENCH_SCHEMA}")
+        for statement in base_tables_ddl():
+            cur.execute(statement)
+    conn.commit()
+
+    # Summaries, stock position triggers and indexes, as at app startup
+    apply_migrations(conn)
+
+    with conn.cursor() as cur:
+        for table, df in tables.items():
+            _copy(cur, table, df)
+        refresh_summaries(cur)
+        for table in [*tables, "item_state_summary", "stock_bucket_summary"]:
+            cur.execute(f"ANALYZE {table}")
+    conn.commit()
@@ -0,0 +1,127 @@
+"""Page query and render benchmarks on synthetic data, compared with a baseline.
+
+    python -m benchmarks.run --dsn postgresql://localhost/scratch [--items 10000] [--cms 33]
+        [--repeat 20] [--only dashboard insights] [--skip-load] [--save-baseline]
+
+Loads seeded synthetic data into the dashboard_bench schema of the given
+database (dropping that schema first), runs every case in benchmarks.cases
+and reports p50/p95 latency and peak Python memory per case. Results are
+compared with benchmarks/baseline.json when it exists and was recorded at
+the same scale.
+"""
+import argparse
+import json
+import time
+import tracemalloc
+from dataclasses import asdict
+from pathlib import Path
+
+import numpy as np
+
+from benchmarks import cases
+from benchmarks.database import connect, load
+from benchmarks.synthetic import Scale, generate
+
+BASELINE = Path(__file__).with_name("baseline.json")
+
+
+def measure(case, conn, ctx, repeat):
+    """p50/p95 wall time in ms over `repeat` runs, and peak traced memory in MiB of one run."""
+    case(conn, ctx)   # warm up caches and plans
+
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        case(conn, ctx)
+        timings.append((time.perf_counter() - start) * 1000)
+
+    # Measured separately: tracing allocations slows the timed runs down
+    tracemalloc.start()
+    try:
+        case(conn, ctx)
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+
+    return {
+        "p50_ms": round(float(np.percentile(timings, 50)), 2),
+        "p95_ms": round(float(np.percentile(timings, 95)), 2),
+        "peak_mib": round(peak / 2**20, 2),
+    }
+
+
+def _change(current, previous):
+    if not previous:
+        return ""
+    return f"{(current - previous) / previous * 100:+6.0f}%"
+
+
+def report(results, baseline):
+    print(f"{'case':28} {'p50 ms':>10} {'':7} {'p95 ms':>10} {'':7} {'peak MiB':>9} {'':7}")
+    for name, result in results.items():
+        before = baseline.get(name, {})
+        print(
+            f"{name:28} "
+            f"{result['p50_ms']:10.1f} {_change(result['p50_ms'], before.get('p50_ms')):7} "
+            f"{result['p95_ms']:10.1f} {_change(result['p95_ms'], before.get('p95_ms')):7} "
+            f"{result['peak_mib']:9.1f} {_change(result['peak_mib'], before.get('peak_mib')):7}"
+        )
+
+
+def load_baseline(scale):
+    if not BASELINE.exists():
+        return {}
+    stored = json.loads(BASELINE.read_text())
+    if stored.get("scale") != asdict(scale):
+        print(f"Baseline was recorded at a different scale ({stored.get('scale')}); not comparing.")
+        return {}
+    return stored["results"]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--dsn", required=True, help="a scratch database; the dashboard_bench schema is recreated")
+    parser.add_argument("--cms", type=int, default=Scale.cms)
+    parser.add_argument("--items", type=int, default=Scale.items)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--repeat", type=int, default=20)
+    parser.add_argument("--only", nargs="*", help="case name prefixes, e.g. dashboard upload.stock")
+    parser.add_argument("--skip-load", action="store_true", help="reuse the data loaded by a previous run")
+    parser.add_argument("--save-baseline", action="store_true")
+    args = parser.parse_args()
+
+    scale = Scale(cms=args.cms, items=args.items)
+    tables = generate(scale, seed=args.seed)
+    print(f"{scale.describe()}: " + ", ".join(f"{name} {len(df):,}" for name, df in tables.items()))
+
+    conn = connect(args.dsn)
+    try:
+        if not args.skip_load:
+            start = time.perf_counter()
+            load(conn, tables)
+            print(f"loaded in {time.perf_counter() - start:.1f} s")
+
+        ctx = cases.make_context(conn, tables, args.dsn)
+        try:
+            selected = {
+                name: case for name, case in cases.CASES.items()
+                if not args.only or any(name.startswith(prefix) for prefix in args.only)
+            }
+            results = {}
+            for name, case in selected.items():
+                results[name] = measure(case, conn, ctx, args.repeat)
+                conn.rollback()
+        finally:
+            cases.close_context(ctx)
+    finally:
+        conn.close()
+
+    report(results, load_baseline(scale))
+
+    if args.save_baseline:
+        BASELINE.write_text(json.dumps({"scale": asdict(scale), "results": results}, indent=2) + "\n")
+        print(f"baseline saved to {BASELINE}")
+
+
+if __name__ == "__main__":
+    main()
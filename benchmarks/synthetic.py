@@ -0,0 +1,128 @@
+"""Seeded synthetic data for every dashboard table.
+
+Frames use the database column names. Scale() defaults to production
+volume: 33 CMS plus 'State Total', 10k items, a few POs and RCs per item.
+"""
+from dataclasses import dataclass
+from datetime import date
+
+import numpy as np
+import pandas as pd
+
+STATE_TOTAL = "State Total"
+
+
+@dataclass(frozen=True)
+class Scale:
+    cms: int = 33
+    items: int = 10_000
+    po_per_item: float = 6.0       # mean; Poisson distributed per item
+    rc_per_item: float = 1.5
+    stocked_share: float = 0.8     # share of (CMS, item) pairs with a stock row
+
+    def describe(self):
+        return f"{self.cms} CMS x {self.items:,} items"
+
+
+def _cms_names(scale):
+    return [f"CMS {i:02d}" for i in range(1, scale.cms + 1)]
+
+
+def _days(rng, start, n, span):
+    return pd.to_datetime(start) + pd.to_timedelta(rng.integers(0, span, n), unit="D")
+
+
+def item_master(scale, rng):
+    codes = [f"{100000 + i}" for i in range(scale.items)]
+    return pd.DataFrame({
+        "item_code": codes,
+        "item_name": [f"Drug {code} {rng.choice(['Tablet', 'Injection', 'Syrup', 'Capsule'])}" for code in codes],
+        "eml_aml_type": rng.choice(["EML", "AML"], scale.items, p=[0.7, 0.3]),
+        "type_cons_dem": rng.choice(["cons", "dem"], scale.items, p=[0.8, 0.2]),
+        "priority_item": rng.choice(["Yes", "No"], scale.items, p=[0.2, 0.8]),
+    })
+
+
+def _per_warehouse(scale, rng, items, value_name, low, high):
+    """(CMS, item) rows for a share of the pairs, plus their 'State Total' sums."""
+    cms = np.repeat(_cms_names(scale), len(items))
+    codes = np.tile(items["item_code"].to_numpy(), scale.cms)
+    keep = rng.random(len(cms)) < scale.stocked_share
+    values = rng.integers(low, high, keep.sum())
+    values[rng.random(len(values)) < 0.15] = 0
+    df = pd.DataFrame({"item_code": codes[keep], "warehouse_name": cms[keep], value_name: values})
+    total = df.groupby("item_code", as_index=False)[value_name].sum()
+    total.insert(1, "warehouse_name", STATE_TOTAL)
+    return pd.concat([df, total], ignore_index=True)
+
+
+def stock_data(scale, rng, items):
+    df = _per_warehouse(scale, rng, items, "stock_quantity", 0, 20_000)
+    # Filled by the stock position triggers on load
+    df["stock_pos_cons"] = np.nan
+    df["stock_pos_con_dem"] = np.nan
+    return df
+
+
+def purchase_order_data(scale, rng, items):
+    counts = rng.poisson(scale.po_per_item, len(items))
+    n = counts.sum()
+    po_qty = rng.integers(100, 100_000, n)
+    received = np.floor(po_qty * rng.uniform(0, 1.1, n).clip(0, 1)).astype(int)
+    rate = np.round(rng.uniform(0.5, 500, n), 2)
+    po_date = _days(rng, "2022-01-01", n, 1200)
+    return pd.DataFrame({
+        "entry_date": date.today(),
+        "po_number": [f"PO{i:08d}" for i in range(n)],
+        "po_date": po_date.date,
+        "item_code": np.repeat(items["item_code"].to_numpy(), counts),
+        "supplier": rng.choice([f"Supplier {i:03d}" for i in range(300)], n),
+        "rate": rate,
+        "rate_unit": rng.choice(["per unit", "per strip", "per vial"], n),
+        "po_qty": po_qty,
+        "po_value": np.round(po_qty * rate, 2),
+        "received_qty": received,
+        "received_value": np.round(received * rate, 2),
+        "supply_status": np.round(received / po_qty * 100, 2),
+        "tender_number": rng.choice([f"T{i:05d}" for i in range(500)], n),
+        "scheduled_delivery_date": (po_date + pd.to_timedelta(rng.integers(30, 120, n), unit="D")).date,
+        "extended_delivery_period_days": rng.integers(0, 60, n),
+    })
+
+
+def rate_contract_data(scale, rng, items):
+    counts = rng.poisson(scale.rc_per_item, len(items))
+    n = counts.sum()
+    start = _days(rng, "2023-01-01", n, 900)
+    # Item/supplier/level must be unique (the RC natural key)
+    level = np.concatenate([np.arange(1, c + 1) for c in counts]) if n else np.array([], dtype=int)
+    return pd.DataFrame({
+        "item_code": np.repeat(items["item_code"].to_numpy(), counts),
+        "supplier": rng.choice([f"Supplier {i:03d}" for i in range(300)], n),
+        "rate": np.round(rng.uniform(0.5, 500, n), 2),
+        "rate_unit": rng.choice(["per unit", "per strip", "per vial"], n),
+        "tender_date": (start - pd.to_timedelta(rng.integers(10, 90, n), unit="D")).date,
+        "contract_from_date": start.date,
+        "contract_to_date": (start + pd.to_timedelta(rng.integers(180, 730, n), unit="D")).date,
+        "rate_contract_level": [f"L{value}" for value in level],
+    })
+
+
+def generate(scale=Scale(), seed=0):
+    """All tables as {table name: DataFrame}, in load order."""
+    rng = np.random.default_rng(seed)
+    items = item_master(scale, rng)
+    return {
+        "item_master": items,
+        "stock_data": stock_data(scale, rng, items),
+        "purchase_order_data": purchase_order_data(scale, rng, items),
+        "rate_contract_data": rate_contract_data(scale, rng, items),
+        "consumption_reference": _per_warehouse(scale, rng, items, "cons_qty_ref", 0, 50_000),
+        "demand_reference": _per_warehouse(scale, rng, items, "dem_qty_ref", 0, 50_000),
+    }
+
+
+def as_upload(dataset, df):
+    """A table frame as the Upload Page receives it: source headers, no defaulted columns."""
+    columns = {column.target: column.source for column in dataset.columns if column.source}
+    return df[list(columns)].rename(columns=columns)
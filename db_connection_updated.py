@@ -1,6 +1,20 @@
+import hashlib
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+
 import psycopg2
 import pandas as pd
 import streamlit as st
+from streamlit.runtime.scriptrunner import add_script_run_ctx, get_script_run_ctx
+
+from db_migrations import apply_migrations
+from profiling import add_query
+from query_builder import normalize_sql
+from query_metrics import QueryRecord, current_page, describe_params, get_query_metrics
+from snapshot import SNAPSHOT_DEFAULTS, Snapshot, duckdb
 
 
 # Establishing database connection
@@ -13,16 +27,530 @@ def get_connection():
         port=st.secrets["postgres"]["port"]  # default for Postgres
     )
 
-def run_query(query):
-    conn = get_connection()
-    df = pd.read_sql(query, conn)
-    conn.close()
+
+# Pool defaults, overridable from the [pool] section of secrets.toml
+POOL_DEFAULTS = {
+    "min_size": 1,
+    "max_size": 10,
+    "max_uses": 500,          # recycle a connection after this many checkouts
+    "max_age": 1800,          # ... or after this many seconds
+    "checkout_timeout": 30,   # seconds to wait when all connections are busy
+}
+
+
+class _PooledConnection:
+    """A pooled psycopg2 connection plus the bookkeeping used for recycling."""
+
+    def __init__(self, conn):
+        self.conn = conn
+        self.created_at = time.monotonic()
+        self.uses = 0
+        self.prepared = set()   # server-side statements PREPAREd on this connection
+
+
+class ConnectionPool:
+    """Thread-safe pool of psycopg2 connections shared by all sessions."""
+
+    def __init__(self, connect, min_size=1, max_size=10, max_uses=500,
+                 max_age=1800, checkout_timeout=30):
+        self._connect = connect
+        self.min_size = min_size
+        self.max_size = max_size
+        self.max_uses = max_uses
+        self.max_age = max_age
+        self.checkout_timeout = checkout_timeout
+
+        self._idle = []
+        self._in_use = {}
+        self._opening = 0
+        self._cond = threading.Condition()
+
+        for _ in range(min_size):
+            self._idle.append(_PooledConnection(self._connect()))
+
+    def _expired(self, pooled):
+        if pooled.conn.closed:
+            return True
+        if self.max_uses and pooled.uses >= self.max_uses:
+            return True
+        if self.max_age and time.monotonic() - pooled.created_at >= self.max_age:
+            return True
+        return False
+
+    @staticmethod
+    def _is_alive(pooled):
+        # Liveness check on checkout: a cheap round trip catches connections
+        # dropped by the server or by an idle timeout on the network path.
+        try:
+            with pooled.conn.cursor() as cur:
+                cur.execute("SELECT 1")
+            pooled.conn.rollback()
+            return True
+        except psycopg2.Error:
+            return False
+
+    @staticmethod
+    def _discard(pooled):
+        try:
+            pooled.conn.close()
+        except psycopg2.Error:
+            pass
+
+    def _size(self):
+        return len(self._idle) + len(self._in_use) + self._opening
+
+    def getconn(self):
+        deadline = time.monotonic() + self.checkout_timeout
+        while True:
+            pooled = None
+            with self._cond:
+                while True:
+                    if self._idle:
+                        pooled = self._idle.pop()
+                        self._in_use[id(pooled.conn)] = pooled
+                        break
+                    if self._size() < self.max_size:
+                        self._opening += 1
+                        break
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        raise TimeoutError(
+                            f"No database connection available after {self.checkout_timeout}s "
+                            f"(pool max_size={self.max_size})"
+                        )
+                    self._cond.wait(remaining)
+
+            # Connecting and health checks happen outside the lock so a slow
+            # server does not stall every other session waiting on the pool.
+            if pooled is None:
+                try:
+                    pooled = _PooledConnection(self._connect())
+                finally:
+                    with self._cond:
+                        self._opening -= 1
+                        if pooled is not None:
+                            self._in_use[id(pooled.conn)] = pooled
+                        else:
+                            self._cond.notify()
+            elif self._expired(pooled) or not self._is_alive(pooled):
+                with self._cond:
+                    self._in_use.pop(id(pooled.conn), None)
+                    self._cond.notify()
+                self._discard(pooled)
+                continue
+
+            pooled.uses += 1
+            return pooled.conn
+
+    def prepared_on(self, conn):
+        """Names of the statements already PREPAREd on a checked-out connection."""
+        return self._in_use[id(conn)].prepared
+
+    def putconn(self, conn):
+        with self._cond:
+            pooled = self._in_use.get(id(conn))
+        if pooled is None:
+            conn.close()
+            return
+
+        # Never hand out a connection that is still inside a transaction
+        reusable = not self._expired(pooled)
+        if reusable:
+            try:
+                conn.rollback()
+            except psycopg2.Error:
+                reusable = False
+
+        with self._cond:
+            self._in_use.pop(id(conn), None)
+            if reusable:
+                self._idle.append(pooled)
+            self._cond.notify()
+        if not reusable:
+            self._discard(pooled)
+
+    def closeall(self):
+        with self._cond:
+            for pooled in self._idle + list(self._in_use.values()):
+                self._discard(pooled)
+            self._idle.clear()
+            self._in_use.clear()
+
+
+@st.cache_resource
+def get_pool():
+    """Process-wide pool, created once and shared across Streamlit sessions."""
+    settings = dict(POOL_DEFAULTS)
+    if "pool" in st.secrets:
+        settings.update(st.secrets["pool"])
+    pool = ConnectionPool(get_connection, **settings)
+
+    try:
+        conn = pool.getconn()
+        try:
+            apply_migrations(conn)
+        finally:
+            pool.putconn(conn)
+    except Exception:
+        # cache_resource does not keep the failure, so the next rerun builds a
+        # new pool; close this one rather than leak its connections
+        pool.closeall()
+        raise
+    return pool
+
+
+@contextmanager
+def connection():
+    """Borrow a pooled connection; it is rolled back and returned on exit."""
+    pool = get_pool()
+    conn = pool.getconn()
+    try:
+        yield conn
+    finally:
+        pool.putconn(conn)
+
+
+@contextmanager
+def transaction():
+    """Yield a cursor inside a transaction that commits on success and rolls back on error."""
+    with connection() as conn:
+        cur = conn.cursor()
+        try:
+            yield cur
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            raise
+        finally:
+            cur.close()
+
+
+# Result cache defaults, overridable from the [query_cache] section of secrets.toml
+CACHE_DEFAULTS = {
+    "max_bytes": 256 * 1024 * 1024,
+}
+
+class QueryCache:
+    """Process-wide LRU cache of query results, invalidated by a data version.
+
+    Every upload or stock recalculation calls bump_data_version(), which
+    empties the cache; results computed against an older version are never
+    stored.
+    """
+
+    def __init__(self, max_bytes):
+        self.max_bytes = max_bytes
+        self._entries = OrderedDict()
+        self._bytes = 0
+        self._version = 0
+        self._lock = threading.Lock()
+
+    @property
+    def version(self):
+        return self._version
+
+    def bump_version(self):
+        with self._lock:
+            self._version += 1
+            self._entries.clear()
+            self._bytes = 0
+            return self._version
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            self._entries.move_to_end(key)
+            return entry[0]
+
+    def put(self, key, df, version):
+        nbytes = int(df.memory_usage(index=True, deep=True).sum())
+        with self._lock:
+            if version != self._version or nbytes > self.max_bytes:
+                return
+            old = self._entries.pop(key, None)
+            if old is not None:
+                self._bytes -= old[1]
+            self._entries[key] = (df, nbytes)
+            self._bytes += nbytes
+            while self._bytes > self.max_bytes:
+                _, (_, evicted) = self._entries.popitem(last=False)
+                self._bytes -= evicted
+
+    def stats(self):
+        with self._lock:
+            return {"version": self._version, "entries": len(self._entries), "bytes": self._bytes}
+
+
+@st.cache_resource
+def get_query_cache():
+    """Process-wide result cache shared across Streamlit sessions."""
+    settings = dict(CACHE_DEFAULTS)
+    if "query_cache" in st.secrets:
+        settings.update(st.secrets["query_cache"])
+    return QueryCache(**settings)
+
+
+def data_version():
+    return get_query_cache().version
+
+
+def bump_data_version():
+    """Invalidate cached results; call after any write to the dashboard tables."""
+    return get_query_cache().bump_version()
+
+
+def _export_snapshot(snapshot):
+    version = data_version()
+    with connection() as conn:
+        snapshot.refresh(conn, version)
+
+
+def _initial_export(snapshot):
+    # Until this finishes, or if it fails, snapshot.version stays None and
+    # every query goes to Postgres
+    try:
+        _export_snapshot(snapshot)
+    except Exception as e:
+        snapshot.error = e
+
+
+@st.cache_resource
+def get_snapshot():
+    """The DuckDB snapshot read engine, or None unless [snapshot] enabled is set and duckdb is installed.
+
+    The first export runs in a background thread, so no page query waits
+    for it.
+    """
+    settings = dict(SNAPSHOT_DEFAULTS)
+    if "snapshot" in st.secrets:
+        settings.update(st.secrets["snapshot"])
+    if not settings["enabled"] or duckdb is None:
+        return None
+
+    snapshot = Snapshot(settings["path"], settings["queries"])
+    threading.Thread(target=_initial_export, args=(snapshot,), name="snapshot_export", daemon=True).start()
+    return snapshot
+
+
+def refresh_snapshot():
+    """Re-export the snapshot; call after bump_data_version(). A no-op when the snapshot is off."""
+    snapshot = get_snapshot()
+    if snapshot is None:
+        return
+    try:
+        _export_snapshot(snapshot)
+    except Exception as e:
+        snapshot.error = e
+        raise
+
+
+def _freeze(params):
+    """Make query parameters hashable so they can be part of a cache key."""
+    if params is None:
+        return None
+    if isinstance(params, dict):
+        return tuple(sorted((k, _freeze(v)) for k, v in params.items()))
+    if isinstance(params, (list, tuple)):
+        return tuple(_freeze(v) for v in params)
+    return params
+
+
+def _query_name(name, query):
+    """Logical name for the metrics; unnamed queries get one from their SQL."""
+    if name:
+        return name
+    return "sql_" + hashlib.md5(normalize_sql(query).encode("utf-8")).hexdigest()[:8]
+
+
+def _new_record(name, query, params):
+    return QueryRecord(
+        name=name,
+        page=current_page() or "",
+        sql=normalize_sql(query),
+        params=describe_params(params),
+    )
+
+
+def _ms_since(start):
+    return (time.perf_counter() - start) * 1000
+
+
+def _store(record):
+    get_query_metrics().record(record)
+    add_query(record.total_ms)
+
+
+@contextmanager
+def record_query(name, query, params=None):
+    """Record a query call that the caller runs itself, e.g. through a server-side cursor.
+
+    Yields the QueryRecord for the caller to fill in timings and row counts;
+    it is stored when the block finishes without an exception.
+    """
+    record = _new_record(_query_name(name, query), query, params)
+    yield record
+    _store(record)
+
+
+def _finish(record, conn, explain, explain_params):
+    """Capture the plan of a slow statement if configured, then store the record."""
+    metrics = get_query_metrics()
+    if metrics.explain_slow and metrics.is_slow(record):
+        try:
+            with conn.cursor() as cur:
+                cur.execute(f"EXPLAIN (ANALYZE, BUFFERS) {explain}", explain_params)
+                record.plan = "\n".join(row[0] for row in cur.fetchall())
+        except psycopg2.Error as e:
+            record.plan = f"EXPLAIN failed: {e}"
+        conn.rollback()
+    _store(record)
+
+
+def _fetch_frame(cur, record):
+    start = time.perf_counter()
+    columns = [col.name for col in cur.description]
+    # coerce_float turns numeric (Decimal) columns into floats, as pd.read_sql does
+    df = pd.DataFrame.from_records(cur.fetchall(), columns=columns, coerce_float=True)
+    record.fetch_ms = _ms_since(start)
+    record.rows = len(df)
+    record.result_bytes = int(df.memory_usage(index=True, deep=True).sum())
     return df
 
-def fetch_one(query):
-    conn = get_connection()
-    cur = conn.cursor()
-    cur.execute(query)
-    result = cur.fetchone()
-    conn.close()
+
+def _cached(key, load, record):
+    query_cache = get_query_cache()
+    cached = query_cache.get(key)
+    if cached is not None:
+        record.cached = True
+        record.rows = len(cached)
+        _store(record)
+        # Pages add and overwrite columns, so hand out a copy
+        return cached.copy()
+
+    version = query_cache.version
+    df = load()
+    query_cache.put(key, df, version)
+    return df.copy()
+
+
+def run_query(query, params=None, cache=True, name=None):
+    """Run a SELECT and return a DataFrame.
+
+    Values must be passed through params (psycopg2 %s / %(name)s placeholders)
+    rather than formatted into the SQL, so equal queries share one cache entry.
+    `name` labels the query on the Query Metrics page, and decides whether
+    it is answered from the DuckDB snapshot when that is enabled.
+    """
+    params = params or None
+    record = _new_record(_query_name(name, query), query, params)
+
+    def load():
+        snapshot = get_snapshot()
+        if snapshot is not None and snapshot.serves(record.name, data_version()):
+            df = snapshot.read(query, params, record)
+            if df is not None:
+                _store(record)
+                return df
+
+        start = time.perf_counter()
+        with connection() as conn:
+            record.wait_ms = _ms_since(start)
+            with conn.cursor() as cur:
+                start = time.perf_counter()
+                cur.execute(query, params)
+                record.execute_ms = _ms_since(start)
+                df = _fetch_frame(cur, record)
+            _finish(record, conn, query, params)
+        return df
+
+    if not cache:
+        return load()
+    return _cached(("sql", normalize_sql(query), _freeze(params)), load, record)
+
+
+@st.cache_resource
+def get_query_executor():
+    """Worker threads for run_queries; more than the pool size would only queue on checkout."""
+    return ThreadPoolExecutor(max_workers=get_pool().max_size, thread_name_prefix="run_queries")
+
+
+def run_queries(queries, cache=True):
+    """Run independent SELECTs concurrently and return {name: DataFrame}.
+
+    `queries` maps a query name to (query, params). Each query runs through
+    run_query on a pooled connection of its own, so the batch takes about
+    as long as its slowest query rather than the sum of all of them.
+    """
+    ctx = get_script_run_ctx()
+
+    def run(name, query, params):
+        # Lets the query see this session's page tag and rerun profile
+        add_script_run_ctx(threading.current_thread(), ctx)
+        return run_query(query, params, cache=cache, name=name)
+
+    if len(queries) == 1:
+        [(name, (query, params))] = queries.items()
+        return {name: run_query(query, params, cache=cache, name=name)}
+
+    executor = get_query_executor()
+    futures = {name: executor.submit(run, name, query, params) for name, (query, params) in queries.items()}
+    return {name: future.result() for name, future in futures.items()}
+
+
+def fetch_one(query, params=None, name=None):
+    params = params or None
+    record = _new_record(_query_name(name, query), query, params)
+
+    start = time.perf_counter()
+    with connection() as conn:
+        record.wait_ms = _ms_since(start)
+        cur = conn.cursor()
+        start = time.perf_counter()
+        cur.execute(query, params)
+        record.execute_ms = _ms_since(start)
+        result = cur.fetchone()
+        cur.close()
+        record.rows = int(result is not None)
+        _finish(record, conn, query, params)
     return result[0] if result else None
+
+
+# Statements registered here are PREPAREd once per pooled connection and
+# then run with EXECUTE, so Postgres parses and plans them only once.
+PREPARED_STATEMENTS = {}
+
+
+def register_statement(name, sql, arg_types):
+    """Register a hot statement using $1, $2, ... placeholders for its arguments."""
+    digest = hashlib.md5(sql.encode("utf-8")).hexdigest()[:8]
+    PREPARED_STATEMENTS[name] = (f"{name}_{digest}", sql, tuple(arg_types))
+
+
+def run_prepared(name, params, cache=True):
+    """Execute a registered statement and return its result as a DataFrame."""
+    server_name, sql, arg_types = PREPARED_STATEMENTS[name]
+    params = tuple(params)
+    record = _new_record(name, sql, params)
+
+    def load():
+        start = time.perf_counter()
+        with connection() as conn:
+            record.wait_ms = _ms_since(start)
+            prepared = get_pool().prepared_on(conn)
+            placeholders = ", ".join(["%s"] * len(params))
+            with conn.cursor() as cur:
+                start = time.perf_counter()
+                if server_name not in prepared:
+                    cur.execute(f"PREPARE {server_name} ({', '.join(arg_types)}) AS {sql}")
+                    prepared.add(server_name)
+                cur.execute(f"EXECUTE {server_name} ({placeholders})", params)
+                record.execute_ms = _ms_since(start)
+                df = _fetch_frame(cur, record)
+            _finish(record, conn, f"EXECUTE {server_name} ({placeholders})", params)
+        return df
+
+    if not cache:
+        return load()
+    return _cached(("prepared", server_name, _freeze(params)), load, record)
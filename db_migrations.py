@@ -0,0 +1,163 @@
+# Versioned schema migrations, applied once per database at startup.
+#
+# Every migration has a version number and is recorded in schema_migrations
+# when it has run, so get_pool() can call apply_migrations() on every start.
+# Never edit a migration that has shipped; append a new one instead.
+from dataclasses import dataclass
+
+import pandas as pd
+
+from db_summaries import create_summaries
+from stock_positions import install_stock_position_triggers
+from upload_schemas import DATASETS
+
+# Arbitrary key for pg_advisory_xact_lock, so app processes starting at the
+# same time do not run the same migration twice.
+MIGRATION_LOCK_ID = 4_187_202_501
+
+
+@dataclass(frozen=True)
+class Index:
+    name: str
+    table: str
+    definition: str      # everything after "ON <table>"
+    used_by: str         # the page queries this index serves
+
+    @property
+    def ddl(self):
+        return f"CREATE INDEX IF NOT EXISTS {self.name} ON {self.table} {self.definition}"
+
+
+# Indexes behind the page queries
+INDEXES = [
+    Index(
+        "stock_data_warehouse_item_idx", "stock_data", "(warehouse_name, item_code)",
+        "Dashboard metrics and item list, Distribution zero-stock list, CMS dropdowns, "
+        "stock position triggers",
+    ),
+    Index(
+        "stock_data_state_total_idx", "stock_data",
+        "(item_code) INCLUDE (stock_quantity, stock_pos_cons, stock_pos_con_dem) "
+        "WHERE warehouse_name = 'State Total'",
+        "item_state_summary refresh (state stock and positions)",
+    ),
+    Index(
+        "purchase_order_data_item_date_idx", "purchase_order_data", "(item_code, po_date DESC)",
+        "Dashboard PO details, item_state_summary refresh (pending supply)",
+    ),
+    Index(
+        "rate_contract_data_item_expiry_idx", "rate_contract_data", "(item_code, contract_to_date)",
+        "Dashboard RC details, Insights RC lists, item_state_summary refresh (nearest expiry)",
+    ),
+    Index(
+        "rate_contract_data_expiry_idx", "rate_contract_data", "(contract_to_date)",
+        "Insights RCs expiring within 3 months",
+    ),
+    Index(
+        "item_master_priority_idx", "item_master", "(item_code) WHERE priority_item = 'Yes'",
+        "Priority-drug filters on the Dashboard and Distribution pages",
+    ),
+    Index(
+        "consumption_reference_item_warehouse_idx", "consumption_reference", "(item_code, warehouse_name)",
+        "Stock position recalculation and triggers",
+    ),
+    Index(
+        "demand_reference_item_warehouse_idx", "demand_reference", "(item_code, warehouse_name)",
+        "Stock position recalculation and triggers",
+    ),
+]
+
+
+def create_indexes(cur):
+    for index in INDEXES:
+        cur.execute(index.ddl)
+        cur.execute(f"ANALYZE {index.table}")
+
+
+def create_natural_key_indexes(cur):
+    """Index every upload table on its natural key, for the row matching of delta loads.
+
+    Not unique: a full-replace upload may repeat a key (e.g. the same PO
+    line once per delivery), and the rows already loaded may too.
+    """
+    for dataset in DATASETS.values():
+        key = ", ".join(f"({expression})" for expression in dataset.key_expressions())
+        cur.execute(f"CREATE INDEX IF NOT EXISTS {dataset.natural_key_index} ON {dataset.table} ({key})")
+        cur.execute(f"ANALYZE {dataset.table}")
+
+
+@dataclass(frozen=True)
+class Migration:
+    version: int
+    name: str
+    apply: object        # callable taking a cursor
+
+
+MIGRATIONS = [
+    Migration(1, "summary tables", create_summaries),
+    Migration(2, "stock position triggers", install_stock_position_triggers),
+    Migration(3, "hot path indexes", create_indexes),
+    Migration(4, "natural key indexes", create_natural_key_indexes),
+]
+
+
+SCHEMA_MIGRATIONS_DDL = """
+    CREATE TABLE IF NOT EXISTS schema_migrations (
+        version     integer PRIMARY KEY,
+        name        text NOT NULL,
+        applied_at  timestamptz NOT NULL DEFAULT now()
+    )
+"""
+
+
+def apply_migrations(conn):
+    """Apply the migrations not yet recorded in schema_migrations.
+
+    Everything runs in one transaction, so a failing migration leaves the
+    schema as it was. Returns the versions that were applied.
+    """
+    applied = []
+    try:
+        with conn.cursor() as cur:
+            cur.execute(SCHEMA_MIGRATIONS_DDL)
+            cur.execute("SELECT pg_advisory_xact_lock(%s)", (MIGRATION_LOCK_ID,))
+            cur.execute("SELECT version FROM schema_migrations")
+            done = {row[0] for row in cur.fetchall()}
+
+            for migration in sorted(MIGRATIONS, key=lambda m: m.version):
+                if migration.version in done:
+                    continue
+                migration.apply(cur)
+                cur.execute(
+                    "INSERT INTO schema_migrations (version, name) VALUES (%s, %s)",
+                    (migration.version, migration.name),
+                )
+                applied.append(migration.version)
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+    return applied
+
+
+def index_report(conn):
+    """The managed indexes with the queries they serve and how often Postgres used them."""
+    stats = pd.read_sql(
+        """
+        SELECT
+            indexrelname AS name,
+            idx_scan AS scans,
+            pg_size_pretty(pg_relation_size(indexrelid)) AS size
+        FROM pg_stat_user_indexes
+        WHERE indexrelname = ANY(%s)
+        """,
+        conn,
+        params=([index.name for index in INDEXES],),
+    )
+    report = pd.DataFrame(
+        [(index.name, index.table, index.used_by) for index in INDEXES],
+        columns=["name", "table", "used_by"],
+    )
+    report = report.merge(stats, on="name", how="left")
+    report["exists"] = report["scans"].notna()
+    return report
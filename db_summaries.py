@@ -0,0 +1,133 @@
+# Precomputed summaries shared by the pages.
+#
+# item_state_summary holds one row per item_master item with its 'State Total'
+# stock and stock positions, pending PO supply, RC availability and nearest RC
+# expiry. It replaces the state_stock / pending_po / rc_items CTEs that every
+# page used to recompute.
+#
+# stock_bucket_summary holds the per-warehouse stock bucket counts behind the
+# Distribution chart, for each reference type and drug category.
+#
+# Both are rebuilt at the end of every upload and stock-position recalculation.
+from stock_buckets import ABOVE_3, MID_1_3, BELOW_1, NO_STOCK, sql_condition
+
+ITEM_STATE_SUMMARY_DDL = [
+    """
+    CREATE MATERIALIZED VIEW IF NOT EXISTS item_state_summary AS
+    WITH state_stock AS (
+        SELECT
+            sd.item_code,
+            COALESCE(SUM(sd.stock_quantity), 0) AS state_stock_qty,
+            COALESCE(SUM(sd.stock_pos_cons), 0) AS stock_pos_cons,
+            COALESCE(SUM(sd.stock_pos_con_dem), 0) AS stock_pos_con_dem
+        FROM stock_data sd
+        WHERE sd.warehouse_name = 'State Total'
+        GROUP BY sd.item_code
+    ),
+    pending_po AS (
+        SELECT
+            pod.item_code,
+            (SUM(COALESCE(pod.po_qty, 0)) - SUM(COALESCE(pod.received_qty, 0))) AS pending_supply
+        FROM purchase_order_data pod
+        GROUP BY pod.item_code
+    ),
+    rc_items AS (
+        SELECT
+            rc.item_code,
+            MIN(rc.contract_to_date) AS nearest_rc_expiry
+        FROM rate_contract_data rc
+        GROUP BY rc.item_code
+    )
+    SELECT
+        im.item_code,
+        im.item_name,
+        im.eml_aml_type,
+        im.type_cons_dem,
+        im.priority_item,
+        ss.state_stock_qty,              -- NULL when the item has no 'State Total' row
+        ss.stock_pos_cons,
+        ss.stock_pos_con_dem,
+        COALESCE(po.pending_supply, 0) AS pending_supply,
+        (rc.item_code IS NOT NULL) AS rc_available,
+        rc.nearest_rc_expiry
+    FROM item_master im
+    LEFT JOIN state_stock ss ON ss.item_code = im.item_code
+    LEFT JOIN pending_po po ON po.item_code = im.item_code
+    LEFT JOIN rc_items rc ON rc.item_code = im.item_code
+    """,
+    # Required by REFRESH ... CONCURRENTLY, and the lookup path for the pages
+    """
+    CREATE UNIQUE INDEX IF NOT EXISTS item_state_summary_item_code_idx
+        ON item_state_summary (item_code)
+    """,
+]
+
+
+# stock_bucket_summary keys -> stock position column / drug filter
+REFERENCE_TYPES = {"con_dem": "stock_pos_con_dem", "cons": "stock_pos_cons"}
+CATEGORIES = {"all": "TRUE", "priority": "im.priority_item = 'Yes'"}
+
+# Bucket label -> count column in stock_bucket_summary
+BUCKET_COLUMNS = {ABOVE_3: "above_3", MID_1_3: "mid_1_3", BELOW_1: "below_1", NO_STOCK: "no_stock"}
+
+STOCK_BUCKET_SUMMARY_DDL = [
+    f"""
+    CREATE TABLE IF NOT EXISTS stock_bucket_summary (
+        warehouse_name  text NOT NULL,
+        reference_type  text NOT NULL,
+        category        text NOT NULL,
+        {", ".join(f"{column} integer NOT NULL" for column in BUCKET_COLUMNS.values())},
+        PRIMARY KEY (reference_type, category, warehouse_name)
+    )
+    """,
+]
+
+
+def _rebuild_stock_bucket_summary_sql():
+    # One scan of stock_data: each row is fanned out to its reference types
+    # and the categories it belongs to, then counted per bucket.
+    pos, qty = "COALESCE(ref.stock_pos, 0)", "COALESCE(sd.stock_quantity, 0)"
+    counts = ",\n            ".join(
+        f"COUNT(*) FILTER (WHERE {sql_condition(bucket, pos, qty)})"
+        for bucket in BUCKET_COLUMNS
+    )
+    references = ", ".join(f"('{key}', sd.{column})" for key, column in REFERENCE_TYPES.items())
+    categories = ", ".join(f"('{key}', {condition})" for key, condition in CATEGORIES.items())
+    return f"""
+        INSERT INTO stock_bucket_summary (
+            warehouse_name, reference_type, category, {", ".join(BUCKET_COLUMNS.values())}
+        )
+        SELECT
+            sd.warehouse_name,
+            ref.reference_type,
+            cat.category,
+            {counts}
+        FROM stock_data sd
+        JOIN item_master im ON im.item_code = sd.item_code
+        CROSS JOIN LATERAL (VALUES {references}) AS ref(reference_type, stock_pos)
+        CROSS JOIN LATERAL (VALUES {categories}) AS cat(category, included)
+        WHERE sd.warehouse_name != '' AND cat.included
+        GROUP BY sd.warehouse_name, ref.reference_type, cat.category
+    """
+
+
+def create_summaries(cur):
+    """Create the summary objects and fill the bucket table (run by db_migrations)."""
+    for statement in ITEM_STATE_SUMMARY_DDL + STOCK_BUCKET_SUMMARY_DDL:
+        cur.execute(statement)
+
+    # A freshly created bucket table is filled now rather than at the next upload
+    cur.execute("SELECT EXISTS (SELECT 1 FROM stock_bucket_summary)")
+    if not cur.fetchone()[0]:
+        cur.execute(_rebuild_stock_bucket_summary_sql())
+
+
+def refresh_summaries(cur):
+    """Rebuild the summaries inside the caller's upload/recalculation transaction.
+
+    CONCURRENTLY keeps the old view contents readable while the refresh runs,
+    and the bucket table swap only becomes visible when the caller commits.
+    """
+    cur.execute("REFRESH MATERIALIZED VIEW CONCURRENTLY item_state_summary")
+    cur.execute("DELETE FROM stock_bucket_summary")
+    cur.execute(_rebuild_stock_bucket_summary_sql())
@@ -0,0 +1,149 @@
+# Download buttons for the page tables.
+#
+# A file is only produced when someone asks for it: the rows are streamed
+# from Postgres through a server-side cursor and written chunk by chunk as
+# CSV, Parquet or XLSX. Finished files are cached per query, parameters and
+# data version, so the same export is served from memory until the next
+# upload.
+import io
+import time
+
+import openpyxl
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+import streamlit as st
+
+from db_connection_updated import connection, data_version, normalize_sql, record_query
+
+EXPORT_CHUNK_ROWS = 20_000
+
+# Format -> (file extension, MIME type)
+FORMATS = {
+    "CSV": ("csv", "text/csv"),
+    "Excel": ("xlsx", "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"),
+    "Parquet": ("parquet", "application/vnd.apache.parquet"),
+}
+
+
+def _ms_since(start):
+    return (time.perf_counter() - start) * 1000
+
+
+def iter_chunks(query, params=None, chunk_rows=EXPORT_CHUNK_ROWS, name=None):
+    """Yield the result of a SELECT as DataFrames of at most chunk_rows rows.
+
+    An empty result still yields one empty frame, so the file gets a header.
+    The export is recorded on the Query Metrics page like any other query
+    call, once the last chunk has been read; fetch_ms is the time spent
+    reading rows, not writing the file.
+    """
+    params = params or None
+    with record_query(name, query, params) as record:
+        start = time.perf_counter()
+        with connection() as conn:
+            record.wait_ms = _ms_since(start)
+            with conn.cursor(name="export") as cur:
+                cur.itersize = chunk_rows
+                start = time.perf_counter()
+                cur.execute(query, params)
+                record.execute_ms = _ms_since(start)
+                start = time.perf_counter()
+                rows = cur.fetchmany(chunk_rows)
+                columns = [column.name for column in cur.description]
+                while True:
+                    chunk = pd.DataFrame(rows, columns=columns)
+                    record.fetch_ms += _ms_since(start)
+                    record.rows += len(chunk)
+                    record.result_bytes += int(chunk.memory_usage(index=True, deep=True).sum())
+                    yield chunk
+                    start = time.perf_counter()
+                    rows = cur.fetchmany(chunk_rows)
+                    if not rows:
+                        break
+
+
+def write_csv(chunks, buffer):
+    header = True
+    for chunk in chunks:
+        buffer.write(chunk.to_csv(index=False, header=header).encode("utf-8"))
+        header = False
+
+
+def write_xlsx(chunks, buffer):
+    # write_only keeps just the current row in memory instead of a cell per value
+    workbook = openpyxl.Workbook(write_only=True)
+    sheet = workbook.create_sheet()
+    header = True
+    for chunk in chunks:
+        if header:
+            sheet.append(list(chunk.columns))
+            header = False
+        for row in chunk.astype(object).where(chunk.notna(), None).itertuples(index=False):
+            sheet.append(list(row))
+    workbook.save(buffer)
+
+
+def write_parquet(chunks, buffer):
+    writer = None
+    for chunk in chunks:
+        table = pa.Table.from_pandas(chunk, preserve_index=False)
+        if writer is None:
+            # A column that is all NULL in the first chunk has no type yet
+            schema = pa.schema([
+                field.with_type(pa.string()) if pa.types.is_null(field.type) else field
+                for field in table.schema
+            ])
+            writer = pq.ParquetWriter(buffer, schema)
+        writer.write_table(table.cast(writer.schema))
+    if writer is not None:
+        writer.close()
+
+
+WRITERS = {"CSV": write_csv, "Excel": write_xlsx, "Parquet": write_parquet}
+
+
+@st.cache_data(max_entries=32, show_spinner=False)
+def _export(sql_key, _query, params, fmt, version, name):
+    # sql_key and version are only part of the cache key (_query is not hashed):
+    # equal queries share a file, and a new upload means a new file
+    buffer = io.BytesIO()
+    WRITERS[fmt](iter_chunks(_query, params, name=name), buffer)
+    return buffer.getvalue()
+
+
+def export_bytes(query, params, fmt, name=None):
+    """The query result as a file in one of FORMATS, cached per data version.
+
+    The query runs as given; normalize_sql() only builds the cache key.
+    """
+    return _export(normalize_sql(query), query, list(params or []), fmt, data_version(), name)
+
+
+def download_buttons(query, params, file_name, key):
+    """Format picker plus a download button that builds the file on request.
+
+    `file_name` is without extension. `key` must be unique on the page.
+    """
+    fmt = st.selectbox("Format", list(FORMATS), key=f"{key}_format", label_visibility="collapsed")
+    extension, mime = FORMATS[fmt]
+
+    # Remember what was prepared so the download button survives reruns
+    prepared_key = f"{key}_prepared"
+    prepared = (fmt, normalize_sql(query), tuple(params or []))
+    if st.session_state.get(prepared_key) != prepared:
+        if st.button("Prepare download", key=f"{key}_prepare", use_container_width=True):
+            st.session_state[prepared_key] = prepared
+            st.rerun()
+        return
+
+    with st.spinner(f"Preparing {fmt} file..."):
+        data = export_bytes(query, params, fmt, name=f"export_{key}")
+    st.download_button(
+        label=f"⬇️ Download {fmt}",
+        data=data,
+        file_name=f"{file_name}.{extension}",
+        mime=mime,
+        key=f"{key}_download",
+        use_container_width=True,
+    )
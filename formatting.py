@@ -0,0 +1,32 @@
+import numpy as np
+import pandas as pd
+
+
+def grid_round(value):
+    """JS expression rounding `value` to a whole number, halves to even as Python's round() does.
+
+    Math.round rounds halves up, so 88.5 would become 89 in the grid where
+    the Python formatting showed 88%.
+    """
+    return f"(Math.abs({value} % 1) === 0.5 ? 2 * Math.round({value} / 2) : Math.round({value}))"
+
+
+# Number formats as AgGrid valueFormatter expressions (x is the cell value),
+# for numeric columns the grid renders in the browser
+GRID_INDIAN_NUMBER = "x == null ? '0' : Math.trunc(x).toLocaleString('en-IN')"
+GRID_PERCENT = grid_round("(x == null ? 0 : x)") + " + '%'"
+
+
+def date_dd_mmm_yyyy(values):
+    """Dates as dd-Mon-yyyy (e.g. 05-Mar-2025); unparseable values become "".
+
+    Long PO histories repeat the same dates, so each distinct value is
+    parsed and formatted once.
+    """
+    values = pd.Series(values)
+    codes, uniques = pd.factorize(values)
+    formatted = pd.to_datetime(pd.Series(uniques), errors="coerce").dt.strftime("%d-%b-%Y").fillna("")
+    # Missing values have code -1, which picks the trailing ""
+    labels = np.append(formatted.to_numpy(dtype=object), "")
+    return pd.Series(labels[codes], index=values.index)
+
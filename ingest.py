@@ -0,0 +1,323 @@
+import io
+import time
+from contextlib import contextmanager
+from dataclasses import dataclass
+
+import openpyxl
+import pandas as pd
+
+
+# Column converters: each one turns a whole uploaded column into the type
+# COPY expects, instead of converting row by row.
+
+def to_text(series):
+    return series.astype("string").str.strip()
+
+
+def to_float(series):
+    return pd.to_numeric(series, errors="coerce").fillna(0).astype(float)
+
+
+def to_int(series):
+    return pd.to_numeric(series, errors="coerce").fillna(0).astype("int64")
+
+
+def to_date(series):
+    return pd.to_datetime(series, errors="coerce").dt.date
+
+
+def to_code(series):
+    """Identifier-like column: whole numbers stay integers (not "1.0"), anything else is text."""
+    if pd.api.types.is_numeric_dtype(series):
+        return pd.to_numeric(series, errors="coerce").round().astype("Int64")
+    return to_text(series)
+
+
+CONVERTERS = {
+    "text": to_text,
+    "code": to_code,
+    "int": to_int,
+    "float": to_float,
+    "date": to_date,
+}
+
+
+@contextmanager
+def timed(timings, stage):
+    """Record the wall time of a block under timings[stage]."""
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        timings[stage] = timings.get(stage, 0.0) + time.perf_counter() - start
+
+
+# Uploads are streamed in chunks of this many rows, so peak memory depends
+# on the chunk size rather than on the size of the file.
+CHUNK_ROWS = 50_000
+PREVIEW_ROWS = 5
+
+
+def _is_csv(uploaded_file):
+    return uploaded_file.name.endswith(".csv")
+
+
+def _xlsx_chunks(uploaded_file, chunk_rows):
+    # Read-only mode parses the sheet row by row instead of loading it whole
+    workbook = openpyxl.load_workbook(uploaded_file, read_only=True, data_only=True)
+    try:
+        sheet = workbook.active
+        rows = sheet.iter_rows(values_only=True)
+        header = next(rows, None)
+        if header is None:
+            return
+        columns = [str(h).strip() if h is not None else f"Unnamed: {i}" for i, h in enumerate(header)]
+        total = max((sheet.max_row or 0) - 1, 1)
+
+        batch, done = [], 0
+        for row in rows:
+            batch.append(row)
+            if len(batch) >= chunk_rows:
+                done += len(batch)
+                yield pd.DataFrame(batch, columns=columns), min(done / total, 1.0)
+                batch = []
+        if batch:
+            yield pd.DataFrame(batch, columns=columns), 1.0
+    finally:
+        workbook.close()
+
+
+def _csv_chunks(uploaded_file, chunk_rows):
+    size = max(getattr(uploaded_file, "size", 0), 1)
+    for chunk in pd.read_csv(uploaded_file, dtype={"Item Code": str}, chunksize=chunk_rows):
+        yield chunk, min(uploaded_file.tell() / size, 1.0)
+
+
+def iter_upload(uploaded_file, chunk_rows=CHUNK_ROWS):
+    """Yield (DataFrame chunk, fraction of the file read) pairs from a CSV/XLSX upload."""
+    uploaded_file.seek(0)
+    chunks = _csv_chunks if _is_csv(uploaded_file) else _xlsx_chunks
+    for chunk, done in chunks(uploaded_file, chunk_rows):
+        if "Item Code" in chunk.columns:
+            # Keep item codes as text, as read_csv(dtype=str) does ("1001", not "1001.0")
+            chunk["Item Code"] = to_code(chunk["Item Code"]).astype("string")
+        yield chunk, done
+
+
+def read_preview(uploaded_file, rows=PREVIEW_ROWS):
+    """First few rows of an upload, for display before inserting."""
+    chunks = iter_upload(uploaded_file, chunk_rows=rows)
+    try:
+        chunk, _ = next(chunks, (pd.DataFrame(), 1.0))
+        return chunk
+    finally:
+        chunks.close()
+
+
+def clean_frame(dataset, df):
+    """Map an uploaded frame onto the dataset's target columns."""
+    missing = [column.source for column in dataset.columns
+               if column.source is not None and column.source not in df.columns]
+    if missing:
+        raise ValueError(f"Uploaded file is missing column(s): {', '.join(missing)}")
+
+    # Blank spreadsheet rows (e.g. below the data) are not records
+    sources = [column.source for column in dataset.columns if column.source is not None]
+    df = df.dropna(subset=sources, how="all")
+
+    cleaned = {}
+    for column in dataset.columns:
+        if column.source is None:
+            value = column.default() if callable(column.default) else column.default
+            cleaned[column.target] = pd.Series(value, index=df.index)
+        else:
+            cleaned[column.target] = CONVERTERS[column.kind](df[column.source])
+    return pd.DataFrame(cleaned, index=df.index)
+
+
+def copy_frame(cur, df, table):
+    """Stream a DataFrame into a table with COPY (CSV format, empty field = NULL)."""
+    buffer = io.StringIO()
+    df.to_csv(buffer, index=False, header=False)
+    buffer.seek(0)
+    columns = ", ".join(df.columns)
+    cur.copy_expert(f"COPY {table} ({columns}) FROM STDIN WITH (FORMAT csv)", buffer)
+
+
+def create_staging(cur, dataset):
+    """Session-private (so unlogged) copy of the target table, dropped at commit."""
+    staging = f"{dataset.table}_staging"
+    cur.execute(f"CREATE TEMP TABLE {staging} (LIKE {dataset.table} INCLUDING DEFAULTS) ON COMMIT DROP")
+    return staging
+
+
+# Repeated natural keys listed in the error message of a rejected upload
+DUPLICATE_EXAMPLES = 5
+
+
+def validate_staging(cur, dataset, staging):
+    for description, predicate in dataset.checks.items():
+        cur.execute(f"SELECT COUNT(*) FROM {staging} WHERE {predicate}")
+        bad_rows = cur.fetchone()[0]
+        if bad_rows:
+            raise ValueError(f"{bad_rows} uploaded rows {description}; nothing was loaded")
+
+
+def _repeated_keys(cur, dataset, table):
+    """(number of keys appearing more than once, a few of them as text) in a table."""
+    key = ", ".join(dataset.key_expressions())
+    cur.execute(f"""
+        SELECT {key}, COUNT(*), COUNT(*) OVER ()
+        FROM {table}
+        GROUP BY {key}
+        HAVING COUNT(*) > 1
+        ORDER BY COUNT(*) DESC
+        LIMIT {DUPLICATE_EXAMPLES}
+    """)
+    rows = cur.fetchall()
+    if not rows:
+        return 0, ""
+    return rows[0][-1], "; ".join(f"{', '.join(row[:-2])} ({row[-2]} rows)" for row in rows)
+
+
+def validate_delta(cur, dataset, staging):
+    """A delta load matches rows on the natural key, so it must be unique on both sides.
+
+    Full replaces do not need this and load repeated keys as they are.
+    """
+    key = " / ".join(dataset.natural_key)
+    repeated, examples = _repeated_keys(cur, dataset, staging)
+    if repeated:
+        raise ValueError(
+            f"{repeated} {key} combinations appear more than once in the upload, e.g. {examples}; "
+            "nothing was loaded. Use a full replace to load them as they are."
+        )
+    repeated, examples = _repeated_keys(cur, dataset, dataset.table)
+    if repeated:
+        raise ValueError(
+            f"{repeated} {key} combinations appear more than once in the current data, e.g. {examples}; "
+            "nothing was loaded. A delta load cannot tell those rows apart; use a full replace."
+        )
+
+
+# Load modes offered on the Upload Page
+REPLACE = "replace"
+DELTA = "delta"
+
+
+@dataclass
+class LoadResult:
+    """Outcome of one upload.
+
+    For a delta load the key sets hold the natural-key tuples that were
+    inserted, updated or deleted. After a replace they are None, meaning
+    every row may have changed.
+    """
+    rows: int
+    inserted: set = None
+    updated: set = None
+    deleted: set = None
+
+    @property
+    def replaced(self):
+        return self.inserted is None
+
+    @property
+    def changed_keys(self):
+        if self.replaced:
+            return None
+        return self.inserted | self.updated | self.deleted
+
+    @property
+    def has_changes(self):
+        return self.replaced or bool(self.changed_keys)
+
+
+def swap_in(cur, dataset, staging):
+    """Replace the live rows with the staged ones; visible to readers at commit."""
+    columns = ", ".join(dataset.column_names)
+    cur.execute(f"DELETE FROM {dataset.table}")
+    cur.execute(f"INSERT INTO {dataset.table} ({columns}) SELECT {columns} FROM {staging}")
+    return LoadResult(rows=cur.rowcount)
+
+
+def apply_delta(cur, dataset, staging):
+    """Apply only the inserts, updates and deletes that differ from the live table.
+
+    Rows are matched on the natural key, NULLs included (validate_delta
+    has made sure every key appears once on each side). A row counts as
+    updated only when one of its tracked columns changed.
+    """
+    key_columns = dataset.natural_key
+    columns = ", ".join(dataset.column_names)
+    returning = ", ".join(f"t.{c}" for c in key_columns)
+    matches = " AND ".join(
+        f"{s} = {t}" for s, t in zip(dataset.key_expressions("s"), dataset.key_expressions("t"))
+    )
+
+    # Deletes: live rows whose key is no longer in the upload
+    cur.execute(f"""
+        DELETE FROM {dataset.table} t
+        WHERE NOT EXISTS (SELECT 1 FROM {staging} s WHERE {matches})
+        RETURNING {returning}
+    """)
+    deleted = set(cur.fetchall())
+
+    # Updates: the row-value comparison skips rows that did not change
+    updated = set()
+    tracked = dataset.tracked_columns
+    if dataset.value_columns and tracked:
+        cur.execute(f"""
+            UPDATE {dataset.table} t
+            SET {", ".join(f"{c} = s.{c}" for c in dataset.value_columns)}
+            FROM {staging} s
+            WHERE {matches}
+                AND ROW({", ".join(f"t.{c}" for c in tracked)})
+                    IS DISTINCT FROM ROW({", ".join(f"s.{c}" for c in tracked)})
+            RETURNING {returning}
+        """)
+        updated = set(cur.fetchall())
+
+    # Inserts: uploaded keys not in the live table
+    cur.execute(f"""
+        INSERT INTO {dataset.table} AS t ({columns})
+        SELECT {columns}
+        FROM {staging} s
+        WHERE NOT EXISTS (SELECT 1 FROM {dataset.table} t WHERE {matches})
+        RETURNING {returning}
+    """)
+    inserted = set(cur.fetchall())
+
+    cur.execute(f"SELECT COUNT(*) FROM {staging}")
+    rows = cur.fetchone()[0]
+    return LoadResult(rows=rows, inserted=inserted, updated=updated, deleted=deleted)
+
+
+def ingest(cur, dataset, chunks, timings, mode=REPLACE):
+    """Clean and COPY each chunk into staging, validate, then swap (or apply delta).
+
+    `chunks` is any iterable of DataFrames; each one is cleaned and copied
+    before the next is read. Runs in the caller's transaction, records the
+    time spent per stage and returns a LoadResult.
+    """
+    with timed(timings, "copy"):
+        staging = create_staging(cur, dataset)
+    chunks = iter(chunks)
+    while True:
+        with timed(timings, "read"):
+            chunk = next(chunks, None)
+        if chunk is None:
+            break
+        with timed(timings, "clean"):
+            cleaned = clean_frame(dataset, chunk)
+        with timed(timings, "copy"):
+            copy_frame(cur, cleaned, staging)
+    with timed(timings, "validate"):
+        validate_staging(cur, dataset, staging)
+        if mode == DELTA:
+            validate_delta(cur, dataset, staging)
+    if mode == DELTA:
+        with timed(timings, "delta"):
+            return apply_delta(cur, dataset, staging)
+    with timed(timings, "swap"):
+        return swap_in(cur, dataset, staging)
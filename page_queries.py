@@ -0,0 +1,313 @@
+# SQL behind the pages, kept free of Streamlit so the same queries can be
+# run by the benchmarks.
+from db_summaries import BUCKET_COLUMNS
+from query_builder import Where
+from stock_buckets import BUCKETS, TILE_SQL_RULES, sql_condition
+
+
+#######################
+# Dashboard
+
+# Sidebar choices -> stock position column / drug filter used by the metric tiles
+STOCK_POS_COLUMNS = {"Consumption/Demand": "stock_pos_con_dem", "Only Consumption": "stock_pos_cons"}
+CATEGORY_CONDITIONS = {"All Drugs": "TRUE", "Priority Drugs": "im.priority_item = 'Yes'"}
+
+
+def metrics_query():
+    """One aggregate returning every tile count for both reference quantities and both categories."""
+    qty = "COALESCE(sd.stock_quantity, 0)"
+    columns = []
+    for category, category_cond in CATEGORY_CONDITIONS.items():
+        columns.append(f'COUNT(DISTINCT sd.item_code) FILTER (WHERE {category_cond}) AS "{category}|total"')
+        for cons_ref, stock_col in STOCK_POS_COLUMNS.items():
+            pos = f"COALESCE(sd.{stock_col}, 0)"
+            for bucket in BUCKETS:
+                condition = sql_condition(bucket, pos, qty, rules=TILE_SQL_RULES)
+                columns.append(
+                    f'COUNT(*) FILTER (WHERE {category_cond} AND ({condition})) AS "{category}|{cons_ref}|{bucket}"'
+                )
+
+    return f"""
+        SELECT
+            {", ".join(columns)}
+        FROM stock_data sd
+        LEFT JOIN item_master im ON im.item_code = sd.item_code
+        WHERE sd.warehouse_name = %s
+    """
+
+
+def parse_metrics(row):
+    """metrics_query() result row -> {(reference quantity, drug category): (total, *bucket counts)}."""
+    metrics = {}
+    for category in CATEGORY_CONDITIONS:
+        total = int(row[f"{category}|total"])
+        for cons_ref in STOCK_POS_COLUMNS:
+            counts = [int(row[f"{category}|{cons_ref}|{bucket}"]) for bucket in BUCKETS]
+            metrics[(cons_ref, category)] = (total, *counts)
+    return metrics
+
+
+# Rows per page of the tile drill-down list
+DRILLDOWN_PAGE_SIZE = 100
+
+
+def drilldown_filters(cms, stock_pos_col, category, bucket=None):
+    """Filters of the drill-down list; bucket None lists every drug."""
+    filters = Where()
+
+    if category == "Priority Drugs":
+        filters.add("s.priority_item = 'Yes'")
+
+    filters.eq("a.warehouse_name", cms)
+
+    if bucket is not None:
+        filters.add(sql_condition(
+            bucket, pos=f"COALESCE(a.{stock_pos_col}, 0)", qty="COALESCE(a.stock_quantity, 0)", rules=TILE_SQL_RULES,
+        ))
+    return filters
+
+
+def drilldown_query(stock_pos_col, filters, after=None, limit=None, item_attributes=True):
+    """Item list behind a metric tile, ordered by item code.
+
+    Pages are fetched with keyset pagination: `after` is the last item code
+    of the previous page, so Postgres reads only the rows it returns
+    instead of counting past an OFFSET. "S No." restarts at 1 on each page.
+    Without item_attributes the item name and types are left out, for
+    callers that join them from reference_data.
+    """
+    where = Where().extend(filters)
+    if after is not None:
+        where.add("a.item_code > %s", after)
+
+    attributes, group_by = "", "a.item_code, s.pending_supply, s.rc_available"
+    if item_attributes:
+        attributes = """
+            s.item_name as "Item Name",
+            s.eml_aml_type as "EML/AML",
+            s.priority_item as "Priority Status",
+            s.type_cons_dem as "Cons/Dem Type","""
+        group_by += ", s.item_name, s.eml_aml_type, s.priority_item, s.type_cons_dem"
+
+    query = f'''
+        SELECT
+            ROW_NUMBER() OVER (ORDER BY a.item_code) as "S No.",
+            a.item_code as "Item Code",{attributes}
+            SUM(COALESCE(a.stock_quantity, 0)) as "Stock Qty",
+            ROUND(AVG(COALESCE(a.{stock_pos_col}, 0)), 2) as "Stock Position",
+            s.pending_supply as "Pending Supply",
+            CASE
+                WHEN s.rc_available THEN 'Avl'
+                ELSE 'Not Avl'
+            END as "RC Status"
+        FROM stock_data a
+        LEFT JOIN item_state_summary s ON s.item_code = a.item_code
+        {where.sql()}
+        GROUP BY {group_by}
+        ORDER BY a.item_code
+    '''
+    params = list(where.params)
+    if limit is not None:
+        query += " LIMIT %s"
+        params.append(limit)
+    return query, params
+
+
+# PO and RC details for a list of item codes ($1 is a text[])
+PO_DETAILS_SQL = """
+    SELECT
+    item_code,
+    ROW_NUMBER() OVER (PARTITION BY item_code ORDER BY po_date DESC) as "S No.",
+    po_number as "PO No.",
+    po_date as "PO Date",
+    supplier as "Supplier Name",
+    po_qty as "PO Qty",
+    received_qty as "Received Qty",
+    supply_status as "Supply %",
+    (po_qty - received_qty) as "Pending Qty",
+    scheduled_delivery_date as "Scheduled Delivery Date"
+    FROM purchase_order_data
+    WHERE item_code = ANY($1)
+    ORDER BY item_code, po_date DESC
+"""
+
+RC_DETAILS_SQL = """
+    SELECT
+    item_code,
+    ROW_NUMBER() OVER (PARTITION BY item_code ORDER BY contract_to_date DESC, rate_contract_level ASC) as "S No.",
+    supplier as "Supplier Name",
+    rate as "Rate",
+    rate_unit as "Rate Unit",
+    tender_date as "Tender Date",
+    contract_from_date as "RC Start Date",
+    contract_to_date as "RC End Date",
+    rate_contract_level as "Bid Level"
+    FROM rate_contract_data
+    WHERE item_code = ANY($1)
+    ORDER BY item_code, contract_to_date DESC, rate_contract_level ASC
+"""
+
+
+def by_item_code(df):
+    """Split detail rows into a dict of frames keyed by item code."""
+    return {code: rows.drop(columns="item_code").reset_index(drop=True)
+            for code, rows in df.groupby("item_code", sort=False)}
+
+
+#######################
+# Insights
+
+# RC counters for All and Priority items, in one pass over item_state_summary.
+# The expiry cutoff is passed as a date so cached counts roll over each day.
+RC_COUNTS_QUERY = """
+SELECT
+    COUNT(*) AS total,
+    COUNT(*) FILTER (WHERE rc_available) AS rc_avl,
+    COUNT(*) FILTER (WHERE nearest_rc_expiry <= %(expiry_cutoff)s) AS rc_3m,
+    COUNT(*) FILTER (WHERE priority_item = 'Yes') AS total_p,
+    COUNT(*) FILTER (WHERE priority_item = 'Yes' AND rc_available) AS rc_avl_p,
+    COUNT(*) FILTER (WHERE priority_item = 'Yes' AND nearest_rc_expiry <= %(expiry_cutoff)s) AS rc_3m_p
+FROM item_state_summary
+"""
+
+
+def _priority_condition(priority_only):
+    return "AND s.priority_item = 'Yes'" if priority_only else ""
+
+
+def expiring_rc_query(priority_only):
+    """Rate contracts ending within 3 months, numbered once per item."""
+    priority_condition = _priority_condition(priority_only)
+    return f"""
+    WITH rc_data AS (
+        SELECT
+            rc.item_code,
+            rc.supplier,
+            rc.rate,
+            rc.rate_unit,
+            rc.contract_from_date,
+            rc.contract_to_date,
+            (rc.contract_to_date - CURRENT_DATE) AS days_till_expiry
+        FROM rate_contract_data rc
+        WHERE rc.contract_to_date IS NOT NULL
+        AND rc.contract_to_date <= (CURRENT_DATE + INTERVAL '3 months')
+    ),
+    unique_items AS (
+    SELECT
+        s.item_code,
+        ROW_NUMBER() OVER (ORDER BY s.item_code) AS serial_no
+    FROM item_state_summary s
+    WHERE s.item_code IN (SELECT item_code FROM rc_data) {priority_condition}
+    )
+
+    SELECT
+        CASE
+            WHEN ROW_NUMBER() OVER (PARTITION BY rc.item_code ORDER BY rc.contract_to_date) = 1
+            THEN ui.serial_no
+        END AS "S No.",
+        rc.item_code AS "Item Code",
+        s.item_name AS "Item Name",
+        rc.supplier AS "Supplier Name",
+        --rc.rate AS "Rate",
+        --rc.rate_unit AS "Rate Unit",
+        TO_CHAR(rc.contract_from_date,'DD-Mon-YY') AS "Contract Start Date",
+        TO_CHAR(rc.contract_to_date,'DD-Mon-YY') AS "Contract End Date",
+        rc.days_till_expiry AS "Days till Contract End",
+        s.stock_pos_con_dem AS "Stock Position (Months)",
+        s.pending_supply AS "Pending Supply (State Total)"
+    FROM rc_data rc
+    INNER JOIN item_state_summary s ON s.item_code = rc.item_code
+    INNER JOIN unique_items ui ON ui.item_code = rc.item_code
+    WHERE 1=1
+    {priority_condition}
+    ORDER BY s.item_code, rc.contract_to_date;
+    """
+
+
+def no_rc_query(priority_only):
+    """Items without any rate contract, lowest stock position first."""
+    return f"""
+        SELECT
+            ROW_NUMBER() OVER (ORDER BY COALESCE(s.stock_pos_con_dem, 0) ASC) AS "S No.",
+            s.item_code AS "Item Code",
+            s.item_name AS "Item Name",
+            COALESCE(s.state_stock_qty,0) AS "Stock Quantity",
+            COALESCE(s.stock_pos_con_dem,0) AS "Stock Position (Months)",
+            s.pending_supply AS "Pending Supply (State Total)"
+        FROM item_state_summary s
+        WHERE NOT s.rc_available
+        {_priority_condition(priority_only)}
+        ORDER BY "S No." ASC;
+    """
+
+
+LOW_STOCK_NO_SUPPLY_QUERY = """
+SELECT
+    ROW_NUMBER() OVER (ORDER BY s.priority_item DESC, s.stock_pos_con_dem) AS "S No.",
+    s.item_code AS "Item Code",
+    s.item_name AS "Item Name",
+    s.priority_item AS "Priority Status",
+    s.state_stock_qty AS "Stock Qty (State Total)",
+    s.stock_pos_con_dem AS "Stock Position (Months)",
+    s.pending_supply AS "Pending Supply (State Total)"
+FROM item_state_summary s
+WHERE
+    s.rc_available
+    AND s.stock_pos_con_dem < 1
+    AND s.pending_supply = 0
+ORDER BY s.priority_item DESC, s.stock_pos_con_dem;
+"""
+
+
+#######################
+# Distribution across state
+
+# Sidebar "Sort CMS by" -> stock_bucket_summary column
+DISTRIBUTION_SORT_COLUMNS = {
+    "Zero Stock Items": "no_stock",
+    ">3 month Items": "above_3",
+    "CMS Name": "warehouse_name",
+}
+
+
+def distribution_query(sort_by):
+    """Precomputed per-warehouse bucket counts; params are (reference_type, category)."""
+    bucket_columns = ", ".join(f'{column} AS "{bucket}"' for bucket, column in BUCKET_COLUMNS.items())
+    return f"""
+SELECT
+    warehouse_name,
+    {bucket_columns}
+FROM stock_bucket_summary
+WHERE reference_type = %s AND category = %s
+ORDER BY {DISTRIBUTION_SORT_COLUMNS[sort_by]} ASC, warehouse_name ASC
+"""
+
+
+def zero_stock_query(cms, priority_only):
+    """Items with no stock at one CMS, with their state-wide stock; returns (sql, params)."""
+    list_filters = Where().add("c.cms_stock = 0")
+
+    if priority_only:
+        list_filters.add("s.priority_item = 'Yes'")
+
+    list_query = f"""
+        WITH cms_data AS (
+            SELECT
+                sd.item_code,
+                COALESCE(SUM(sd.stock_quantity), 0) AS cms_stock
+            FROM stock_data sd
+            WHERE sd.warehouse_name = %s
+            GROUP BY sd.item_code
+        )
+        SELECT
+            ROW_NUMBER() OVER (ORDER BY s.state_stock_qty DESC) AS "S No.",
+            c.item_code AS "Item Code",
+            s.item_name AS "Item Name",
+            c.cms_stock AS "Stock at CMS",
+            s.state_stock_qty AS "Total Stock in State"
+        FROM cms_data c
+        LEFT JOIN item_state_summary s ON s.item_code = c.item_code
+        {list_filters.sql()}
+        ORDER BY s.state_stock_qty DESC;
+    """
+    return list_query, [cms] + list_filters.params
@@ -1,10 +1,13 @@
 import streamlit as st
 import pandas as pd
-import io
+from datetime import date, timedelta
 
 from st_aggrid import AgGrid, GridOptionsBuilder, JsCode
-from db_connection_updated import run_query  # Assuming you have a db helper
+from db_connection_updated import run_queries  # Assuming you have a db helper
 from streamlit_extras.stylable_container import stylable_container
+from exports import download_buttons
+from page_queries import RC_COUNTS_QUERY, expiring_rc_query, no_rc_query, LOW_STOCK_NO_SUPPLY_QUERY
+from profiling import start_rerun, section, render_profile
 
 
 # Define your button styles once for all colors
@@ -44,6 +47,8 @@ st.set_page_config(
     layout="wide",
     initial_sidebar_state="expanded")
 
+start_rerun("Insights")
+
 # Page header
 st.markdown("<h1 style='font-size: 42px;'>🔍 Insights</h1>", unsafe_allow_html=True)
 st.markdown("---")
@@ -51,56 +56,47 @@ st.markdown("---")
 # Functions
 
 
-#  Queries for Total Items
+# Initialize session state for displaying details
+if 'selected_metric' not in st.session_state:
+    st.session_state.selected_metric = None
 
-# RC Avl Count
-query_count_rc_avl = """
-SELECT COUNT(DISTINCT rcd.item_code)
-FROM rate_contract_data rcd
-JOIN item_master im ON rcd.item_code = im.item_code
-WHERE im.priority_item in ('Yes','No')
-"""
-df = run_query(query_count_rc_avl)
-count_rc_avl = df.iloc[0, 0] if not df.empty else 0
 
-# RC Not Avl Count
-count_rc_notavl = (522 - count_rc_avl) 
+def _select_metric(metric):
+    # Runs before the rerun, so the list query below is known up front
+    st.session_state.selected_metric = metric
 
-# RC expiring in 3 months count
-query_count_rc_3m = """
-select count(distinct item_code) from rate_contract_data 
-where contract_to_date <= current_date + 90
-and item_code in (select item_code from item_master)
-"""
 
-df = run_query(query_count_rc_3m)
-count_rc_3m = df.iloc[0, 0] if not df.empty else 0
-
-#  Queries for Priority Items
-
-# RC Avl Count
-query_count_rc_avl_p = """
-SELECT COUNT(DISTINCT rcd.item_code)
-FROM rate_contract_data rcd
-JOIN item_master im ON rcd.item_code = im.item_code
-WHERE im.priority_item = 'Yes' """
-df = run_query(query_count_rc_avl_p)
-count_rc_avl_p = df.iloc[0, 0] if not df.empty else 0
-
-# RC Not Avl Count
-count_rc_notavl_p = (100 - count_rc_avl_p) 
-
-# RC expiring in 3 months count
-query_count_rc_3m_p = """
-SELECT COUNT(DISTINCT rcd.item_code)
-FROM rate_contract_data rcd
-JOIN item_master im ON rcd.item_code = im.item_code
-WHERE im.priority_item = 'Yes'
-and rcd.contract_to_date <= current_date + 90
-"""
+priority_only = st.session_state.selected_metric in ("exp_3m_p", "not_avl_p")
 
-df = run_query(query_count_rc_3m_p)
-count_rc_3m_p = df.iloc[0, 0] if not df.empty else 0
+# The page's queries are independent of each other and run concurrently:
+# the RC counters (one pass over item_state_summary), the low-stock list
+# and the list of the selected counter, if any
+batch = {
+    "rc_counts": (RC_COUNTS_QUERY, {"expiry_cutoff": date.today() + timedelta(days=90)}),
+    "low_stock_no_supply": (LOW_STOCK_NO_SUPPLY_QUERY, None),
+}
+if st.session_state.selected_metric in ("exp_3m_p", "exp_3m"):
+    batch["expiring_rc"] = (expiring_rc_query(priority_only), None)
+elif st.session_state.selected_metric in ("not_avl_p", "not_avl"):
+    batch["no_rc"] = (no_rc_query(priority_only), None)
+
+with section("queries"):
+    results = run_queries(batch)
+
+with section("RC counts"):
+    counts = results["rc_counts"].iloc[0]
+
+    #  Counts for Total Items
+    count_total = int(counts["total"])
+    count_rc_avl = int(counts["rc_avl"])
+    count_rc_notavl = count_total - count_rc_avl
+    count_rc_3m = int(counts["rc_3m"])
+
+    #  Counts for Priority Items
+    count_total_p = int(counts["total_p"])
+    count_rc_avl_p = int(counts["rc_avl_p"])
+    count_rc_notavl_p = count_total_p - count_rc_avl_p
+    count_rc_3m_p = int(counts["rc_3m_p"])
 
 
 # --- Data Queries ---
@@ -170,259 +166,111 @@ ORDER BY rc.contract_to_date;
 st.markdown("### 📆 Summary of Rate Contracts")
 
 st.markdown("<br>", unsafe_allow_html=True)
-    
-# Initialize session state for displaying details
-if 'selected_metric' not in st.session_state:
-    st.session_state.selected_metric = None
 
-col1, col2, col3 = st.columns([6, 2, 2])
+with section("RC summary tiles"):
+    col1, col2, col3 = st.columns([6, 2, 2])
 
-with col1:
-    st.markdown("<span style='color:white;'>--</span>", unsafe_allow_html=True)
-    if st.button("**Total Items**", key="none1", use_container_width=True):
+    with col1:
+        st.markdown("<span style='color:white;'>--</span>", unsafe_allow_html=True)
+        if st.button("**Total Items**", key="none1", use_container_width=True):
+                st.session_state.selected_metric = key
+        if st.button("**Items with RC Available**", key="none2", use_container_width=True):
+            st.session_state.selected_metric = key
+        if st.button("**Items with RC Not Available**", key="none3", use_container_width=True):
+            st.session_state.selected_metric = key
+        if st.button("**Items for which RC expiring in 3 months**", key="none4", use_container_width=True):
             st.session_state.selected_metric = key
-    if st.button("**Items with RC Available**", key="none2", use_container_width=True):
-        st.session_state.selected_metric = key
-    if st.button("**Items with RC Not Available**", key="none3", use_container_width=True):
-        st.session_state.selected_metric = key
-    if st.button("**Items for which RC expiring in 3 months**", key="none4", use_container_width=True):
-        st.session_state.selected_metric = key
-
-with col2:
-    left, center, right = st.columns([1,3,1])
-    with center:
-        st.markdown("**All Items**")
-    if st.button("522", key="total", use_container_width=True):
-        st.session_state.selected_metric = "total"
-    if st.button(str(count_rc_avl), key="avl", use_container_width=True):
-        st.session_state.selected_metric = "avl"
-    with stylable_container("darkred1", css_styles=button_styles["darkred"]):
-        if st.button(str(count_rc_notavl), key="not_avl", use_container_width=True):
-            st.session_state.selected_metric = "not_avl"
-    with stylable_container("lightred1", css_styles=button_styles["lightred"]):
-        if st.button(str(count_rc_3m), key="exp_3m", use_container_width=True):
-            st.session_state.selected_metric = "exp_3m"
-
-with col3:
-    st.markdown("  **Priority Items**")
-    if st.button("100", key="total_p", use_container_width=True):
-        st.session_state.selected_metric = "total_p"
-    if st.button(str(count_rc_avl_p), key="avl_p", use_container_width=True):
-        st.session_state.selected_metric = "avl_p"
-    with stylable_container("darkred2", css_styles=button_styles["darkred"]):
-        if st.button(str(count_rc_notavl_p), key="not_avl_p", use_container_width=True):
-            st.session_state.selected_metric = "not_avl_p"
-    with stylable_container("lightred2", css_styles=button_styles["lightred"]):
-        if st.button(str(count_rc_3m_p), key="exp_3m_p", use_container_width=True):
-            st.session_state.selected_metric = "exp_3m_p"
-
-    priority_condition = ""
-    if st.session_state.selected_metric in ("exp_3m_p", "not_avl_p"):
-        priority_condition = "AND im.priority_item = 'Yes'"
-
-if st.session_state.selected_metric in ("exp_3m_p", "exp_3m"):
-
-    # SQL Query with dynamic filter
-    rc_query = f"""
-    WITH rc_data AS (
-        SELECT 
-            rc.item_code,
-            rc.supplier,
-            rc.rate,
-            rc.rate_unit,
-            rc.contract_from_date,
-            rc.contract_to_date,
-            (rc.contract_to_date - CURRENT_DATE) AS days_till_expiry
-        FROM rate_contract_data rc
-        WHERE rc.contract_to_date IS NOT NULL
-        AND rc.contract_to_date <= (CURRENT_DATE + INTERVAL '3 months')
-    ),
-    state_stock AS (
-        SELECT 
-            sd.item_code,
-            COALESCE(SUM(sd.stock_quantity),0) AS state_stock_qty,
-            COALESCE(SUM(sd.stock_pos_con_dem),0) AS stock_pos_con_dem
-        FROM stock_data sd
-        WHERE sd.warehouse_name = 'State Total'
-        GROUP BY sd.item_code
-    ),
-    pending_po AS (
-        SELECT 
-            pod.item_code,
-            (SUM(COALESCE(pod.po_qty,0)) - SUM(COALESCE(pod.received_qty,0))) AS pending_supply
-        FROM purchase_order_data pod
-        GROUP BY pod.item_code
-    ),
-    unique_items AS (
-    SELECT 
-        im.item_code,
-        ROW_NUMBER() OVER (ORDER BY im.item_code) AS serial_no
-    FROM item_master im
-    INNER JOIN rc_data rc ON rc.item_code = im.item_code
-    WHERE 1=1 {priority_condition}
-    GROUP BY im.item_code
-    )
-
-    SELECT 
-        ui.serial_no AS "S No.",
-        rc.item_code AS "Item Code",
-        im.item_name AS "Item Name",
-        rc.supplier AS "Supplier Name",
-        --rc.rate AS "Rate",
-        --rc.rate_unit AS "Rate Unit",
-        TO_CHAR(rc.contract_from_date,'DD-Mon-YY') AS "Contract Start Date",
-        TO_CHAR(rc.contract_to_date,'DD-Mon-YY') AS "Contract End Date",
-        rc.days_till_expiry AS "Days till Contract End",
-        ss.stock_pos_con_dem AS "Stock Position (Months)",
-        COALESCE(po.pending_supply,0) AS "Pending Supply (State Total)"
-    FROM rc_data rc
-    LEFT JOIN state_stock ss ON ss.item_code = rc.item_code
-    LEFT JOIN pending_po po ON po.item_code = rc.item_code
-    INNER JOIN item_master im ON im.item_code = rc.item_code
-    INNER JOIN unique_items ui ON ui.item_code = rc.item_code
-    WHERE 1=1
-    {priority_condition}
-    ORDER BY im.item_code, rc.contract_to_date;
-    """
-
-    df = run_query(rc_query)
-
-    df['S No.'] = df['S No.'].where(~df['Item Code'].duplicated())
-
-    if not df.empty:
-        st.markdown("<br>", unsafe_allow_html=True)
-        addnl_text ="All Items" 
-        if st.session_state.selected_metric == "exp_3m_p":
-            addnl_text =  "Priority Items"
-
-        st.markdown(f"#### Rate Contracts expiring within 3 months - {addnl_text}")
-        gb = GridOptionsBuilder.from_dataframe(df)
-        gb.configure_default_column(resizable=True, filter=False, sortable=True, cellStyle={"textAlign": "center"}, wrapHeaderText=True, autoHeaderHeight=True)
-        gb.configure_column("S No.", filter=False, width=100)
-        gb.configure_column("Item Code", filter=False, width=150)
-        gb.configure_column("Item Name", filter=False, width=600, cellStyle={"textAlign": "left"})
-        gb.configure_column("Supplier Name", filter=False, width=400, cellStyle={"textAlign": "left"})
-        gb.configure_column("Days till Contract End", filter=False)
-        #gb.configure_column("Rate", type=["numericColumn"], valueFormatter="x.toLocaleString()")
-        gb.configure_column("Stock Position (Months)", type=["numericColumn"], valueFormatter="x.toLocaleString()")
-        gb.configure_column("Pending Supply (State Total)", type=["numericColumn"], valueFormatter="x.toLocaleString()")
-        grid_options = gb.build()
-        AgGrid(df, gridOptions=grid_options, fit_columns_on_grid_load=True, theme="streamlit", height=450, width=800)
-
-        # Download Table Button
-        # Convert to CSV
-        csv_buffer = io.StringIO()
-        df.to_csv(csv_buffer, index=False)
-        csv_data = csv_buffer.getvalue()
-
-        col1, col2 = st.columns([4,1])
-
-        with col2:
-                st.download_button(
-                    label="⬇️ Download CSV",
-                    data=csv_data,
-                    file_name="list.csv",
-                    mime="text/csv",
-                    use_container_width=True
-                )
-    else:
-        st.info("No expiring rate contracts found for the selected filters.")
-
-
-if st.session_state.selected_metric in ("not_avl_p", "not_avl"):
-
-    # SQL Query with dynamic filter
-    rc_query = f"""
-        WITH rc_items AS (
-            SELECT DISTINCT item_code
-            FROM rate_contract_data
-        ),
-        no_rc_items AS (
-            SELECT item_code
-            FROM item_master im
-            WHERE item_code NOT IN (SELECT item_code FROM rc_items)
-            {priority_condition}
-        ),
-        state_stock AS (
-            SELECT 
-                sd.item_code,
-                COALESCE(SUM(sd.stock_quantity),0) AS stock_quantity,
-                COALESCE(SUM(sd.stock_pos_con_dem),0) AS stock_pos_con_dem
-            FROM stock_data sd
-            WHERE sd.warehouse_name = 'State Total'
-            GROUP BY sd.item_code
-        ),
-        pending_po AS (
-            SELECT 
-                pod.item_code,
-                (SUM(COALESCE(pod.po_qty,0)) - SUM(COALESCE(pod.received_qty,0))) AS pending_supply
-            FROM purchase_order_data pod
-            GROUP BY pod.item_code
-        ),
-        serials AS (
-            SELECT 
-                nri.item_code,
-                ROW_NUMBER() OVER (ORDER BY COALESCE(ss.stock_pos_con_dem, 0) ASC) AS serial_no
-            FROM no_rc_items nri
-            LEFT JOIN state_stock ss ON ss.item_code = nri.item_code
-        )
-
-        SELECT
-            s.serial_no AS "S No.",
-            im.item_code AS "Item Code",
-            im.item_name AS "Item Name",
-    		COALESCE(ss.stock_quantity,0) AS "Stock Quantity",
-            COALESCE(ss.stock_pos_con_dem,0) AS "Stock Position (Months)",
-            COALESCE(po.pending_supply,0) AS "Pending Supply (State Total)"
-        FROM no_rc_items nri
-        INNER JOIN item_master im ON im.item_code = nri.item_code
-        LEFT JOIN state_stock ss ON ss.item_code = nri.item_code
-        LEFT JOIN pending_po po ON po.item_code = nri.item_code
-        INNER JOIN serials s ON s.item_code = nri.item_code
-        ORDER BY "S No." ASC;
-    
-    """
 
-    df = run_query(rc_query)
-
-    df['S No.'] = df['S No.'].where(~df['Item Code'].duplicated())
-
-    if not df.empty:
-        st.markdown("<br>", unsafe_allow_html=True)
-        addnl_text ="All" 
-        if st.session_state.selected_metric == "not_avl_p":
-            addnl_text =  "Priority"
-
-        st.markdown(f"#### {addnl_text} Items with no active Rate Contract")
-        gb = GridOptionsBuilder.from_dataframe(df)
-        gb.configure_default_column(resizable=True, filter=False, sortable=True, cellStyle={"textAlign": "center"}, wrapHeaderText=True, autoHeaderHeight=True)
-        gb.configure_column("S No.", filter=False, width=100)
-        gb.configure_column("Item Code", filter=False, width=150)
-        gb.configure_column("Item Name", filter=False, width=600, cellStyle={"textAlign": "left"})
-        gb.configure_column("Stock Position (Months)", type=["numericColumn"], valueFormatter="x.toLocaleString()")
-        gb.configure_column("Pending Supply (State Total)", type=["numericColumn"], valueFormatter="x.toLocaleString()")
-        gb.configure_column("Stock Quantity", type=["numericColumn"], valueFormatter="x.toLocaleString()", filter=False)
-        grid_options = gb.build()
-        AgGrid(df, gridOptions=grid_options, fit_columns_on_grid_load=True, theme="streamlit", height=450, width=800)
-
-        # Download Table Button
-        # Convert to CSV
-        csv_buffer = io.StringIO()
-        df.to_csv(csv_buffer, index=False)
-        csv_data = csv_buffer.getvalue()
-
-        col1, col2 = st.columns([4,1])
-
-        with col2:
-                st.download_button(
-                    label="⬇️ Download CSV",
-                    data=csv_data,
-                    file_name="list.csv",
-                    mime="text/csv",
-                    use_container_width=True
-                )
-    else:
-        st.info("All items have active rate contracts.")
+    with col2:
+        left, center, right = st.columns([1,3,1])
+        with center:
+            st.markdown("**All Items**")
+        st.button(str(count_total), key="total", on_click=_select_metric, args=("total",), use_container_width=True)
+        st.button(str(count_rc_avl), key="avl", on_click=_select_metric, args=("avl",), use_container_width=True)
+        with stylable_container("darkred1", css_styles=button_styles["darkred"]):
+            st.button(str(count_rc_notavl), key="not_avl", on_click=_select_metric, args=("not_avl",), use_container_width=True)
+        with stylable_container("lightred1", css_styles=button_styles["lightred"]):
+            st.button(str(count_rc_3m), key="exp_3m", on_click=_select_metric, args=("exp_3m",), use_container_width=True)
+
+    with col3:
+        st.markdown("  **Priority Items**")
+        st.button(str(count_total_p), key="total_p", on_click=_select_metric, args=("total_p",), use_container_width=True)
+        st.button(str(count_rc_avl_p), key="avl_p", on_click=_select_metric, args=("avl_p",), use_container_width=True)
+        with stylable_container("darkred2", css_styles=button_styles["darkred"]):
+            st.button(str(count_rc_notavl_p), key="not_avl_p", on_click=_select_metric, args=("not_avl_p",), use_container_width=True)
+        with stylable_container("lightred2", css_styles=button_styles["lightred"]):
+            st.button(str(count_rc_3m_p), key="exp_3m_p", on_click=_select_metric, args=("exp_3m_p",), use_container_width=True)
+
+with section("expiring RC list"):
+    if st.session_state.selected_metric in ("exp_3m_p", "exp_3m"):
+
+        # SQL Query with dynamic filter
+        rc_query = expiring_rc_query(priority_only)
+
+        df = results["expiring_rc"]
+
+        if not df.empty:
+            st.markdown("<br>", unsafe_allow_html=True)
+            addnl_text ="All Items" 
+            if st.session_state.selected_metric == "exp_3m_p":
+                addnl_text =  "Priority Items"
+
+            st.markdown(f"#### Rate Contracts expiring within 3 months - {addnl_text}")
+            gb = GridOptionsBuilder.from_dataframe(df)
+            gb.configure_default_column(resizable=True, filter=False, sortable=True, cellStyle={"textAlign": "center"}, wrapHeaderText=True, autoHeaderHeight=True)
+            gb.configure_column("S No.", filter=False, width=100)
+            gb.configure_column("Item Code", filter=False, width=150)
+            gb.configure_column("Item Name", filter=False, width=600, cellStyle={"textAlign": "left"})
+            gb.configure_column("Supplier Name", filter=False, width=400, cellStyle={"textAlign": "left"})
+            gb.configure_column("Days till Contract End", filter=False)
+            #gb.configure_column("Rate", type=["numericColumn"], valueFormatter="x.toLocaleString()")
+            gb.configure_column("Stock Position (Months)", type=["numericColumn"], valueFormatter="x.toLocaleString()")
+            gb.configure_column("Pending Supply (State Total)", type=["numericColumn"], valueFormatter="x.toLocaleString()")
+            grid_options = gb.build()
+            AgGrid(df, gridOptions=grid_options, fit_columns_on_grid_load=True, theme="streamlit", height=450, width=800)
+
+            # Download Table Button
+            col1, col2 = st.columns([4,1])
+
+            with col2:
+                download_buttons(rc_query, None, "list", key="expiring_rc_export")
+        else:
+            st.info("No expiring rate contracts found for the selected filters.")
+
+
+with section("no RC list"):
+    if st.session_state.selected_metric in ("not_avl_p", "not_avl"):
+
+        # SQL Query with dynamic filter
+        rc_query = no_rc_query(priority_only)
+
+        df = results["no_rc"]
+
+        if not df.empty:
+            st.markdown("<br>", unsafe_allow_html=True)
+            addnl_text ="All" 
+            if st.session_state.selected_metric == "not_avl_p":
+                addnl_text =  "Priority"
+
+            st.markdown(f"#### {addnl_text} Items with no active Rate Contract")
+            gb = GridOptionsBuilder.from_dataframe(df)
+            gb.configure_default_column(resizable=True, filter=False, sortable=True, cellStyle={"textAlign": "center"}, wrapHeaderText=True, autoHeaderHeight=True)
+            gb.configure_column("S No.", filter=False, width=100)
+            gb.configure_column("Item Code", filter=False, width=150)
+            gb.configure_column("Item Name", filter=False, width=600, cellStyle={"textAlign": "left"})
+            gb.configure_column("Stock Position (Months)", type=["numericColumn"], valueFormatter="x.toLocaleString()")
+            gb.configure_column("Pending Supply (State Total)", type=["numericColumn"], valueFormatter="x.toLocaleString()")
+            gb.configure_column("Stock Quantity", type=["numericColumn"], valueFormatter="x.toLocaleString()", filter=False)
+            grid_options = gb.build()
+            AgGrid(df, gridOptions=grid_options, fit_columns_on_grid_load=True, theme="streamlit", height=450, width=800)
+
+            # Download Table Button
+            col1, col2 = st.columns([4,1])
+
+            with col2:
+                download_buttons(rc_query, None, "list", key="no_rc_export")
+        else:
+            st.info("All items have active rate contracts.")
 
 
 
@@ -430,84 +278,42 @@ st.markdown("---")
 
 # Section 2: Low stock, RC available, but no pending supply
 
-query = """
-WITH rc_items AS (
-    SELECT DISTINCT rc.item_code
-    FROM rate_contract_data rc
-),
-state_stock AS (
-    SELECT
-        sd.item_code,
-        COALESCE(SUM(sd.stock_pos_con_dem), 0) AS stock_pos_con_dem,
-        COALESCE(SUM(sd.stock_quantity), 0) AS stock_qty
-    FROM stock_data sd
-    WHERE sd.warehouse_name = 'State Total'
-    GROUP BY sd.item_code
-),
-pending_po AS (
-    SELECT
-        pod.item_code,
-        (SUM(COALESCE(pod.po_qty,0)) - SUM(COALESCE(pod.received_qty,0))) AS pending_supply
-    FROM purchase_order_data pod
-    GROUP BY pod.item_code
-)
-SELECT
-    ROW_NUMBER() OVER (ORDER BY im.priority_item DESC, ss.stock_pos_con_dem) AS "S No.",
-    im.item_code AS "Item Code",
-    im.item_name AS "Item Name",
-    im.priority_item AS "Priority Status",
-    ss.stock_qty AS "Stock Qty (State Total)",
-    ss.stock_pos_con_dem AS "Stock Position (Months)",
-    COALESCE(po.pending_supply,0) AS "Pending Supply (State Total)"
-FROM item_master im
-INNER JOIN state_stock ss ON ss.item_code = im.item_code
-INNER JOIN rc_items rc ON rc.item_code = im.item_code
-LEFT JOIN pending_po po ON po.item_code = im.item_code
-WHERE
-    ss.stock_pos_con_dem < 1
-    AND (COALESCE(po.pending_supply, 0) = 0)
-ORDER BY im.priority_item DESC, ss.stock_pos_con_dem;
-"""
+with section("low stock list"):
+    query = LOW_STOCK_NO_SUPPLY_QUERY
 
-df = run_query(query)
+    df = results["low_stock_no_supply"]
 
-count = len(df)
+    count = len(df)
 
-st.markdown(f"### ⚠️ Low stock, RC available, but no pending supply: {count}")
+    st.markdown(f"### ⚠️ Low stock, RC available, but no pending supply: {count}")
 
-if st.button("Show List", key="low_stock"):
+    if st.button("Show List", key="low_stock"):
+        st.session_state.show_low_stock = True
 
-    if not df.empty:
-        gb = GridOptionsBuilder.from_dataframe(df)
-        gb.configure_default_column(resizable=True, filter=False, sortable=True, cellStyle={"textAlign": "center"}, wrapHeaderText=True, autoHeaderHeight=True)
-        gb.configure_column("S No.", filter=False, width=100)
-        gb.configure_column("Item Code", filter=False, width=150)
-        gb.configure_column("Item Name", filter=False, width=600, cellStyle={"textAlign": "left"})
-        gb.configure_column("Stock Qty (State Total)", type=["numericColumn"], valueFormatter="x.toLocaleString()", cellStyle={"textAlign": "right"})
-        gb.configure_column("Stock Position (Months)", filter=False)
-        gb.configure_column("Pending Supply (State Total)", type=["numericColumn"], valueFormatter="x.toLocaleString()")
+    # Stays open across reruns, e.g. while a download is prepared
+    if st.session_state.get("show_low_stock"):
 
-        grid_options = gb.build()
+        if not df.empty:
+            gb = GridOptionsBuilder.from_dataframe(df)
+            gb.configure_default_column(resizable=True, filter=False, sortable=True, cellStyle={"textAlign": "center"}, wrapHeaderText=True, autoHeaderHeight=True)
+            gb.configure_column("S No.", filter=False, width=100)
+            gb.configure_column("Item Code", filter=False, width=150)
+            gb.configure_column("Item Name", filter=False, width=600, cellStyle={"textAlign": "left"})
+            gb.configure_column("Stock Qty (State Total)", type=["numericColumn"], valueFormatter="x.toLocaleString()", cellStyle={"textAlign": "right"})
+            gb.configure_column("Stock Position (Months)", filter=False)
+            gb.configure_column("Pending Supply (State Total)", type=["numericColumn"], valueFormatter="x.toLocaleString()")
 
-        AgGrid(df, gridOptions=grid_options, fit_columns_on_grid_load=True, theme="streamlit", height=450, width=800)
+            grid_options = gb.build()
 
-        # Download Table Button
-        # Convert to CSV
-        csv_buffer = io.StringIO()
-        df.to_csv(csv_buffer, index=False)
-        csv_data = csv_buffer.getvalue()
+            AgGrid(df, gridOptions=grid_options, fit_columns_on_grid_load=True, theme="streamlit", height=450, width=800)
 
-        col1, col2 = st.columns([4,1])
+            # Download Table Button
+            col1, col2 = st.columns([4,1])
 
-        with col2:
-                st.download_button(
-                    label="⬇️ Download Table",
-                    data=csv_data,
-                    file_name="list.csv",
-                    mime="text/csv",
-                    use_container_width=True
-                )
-    else:
-        st.info("No items found that match: low stock, RC available, and no pending supply.")
+            with col2:
+                download_buttons(query, None, "list", key="low_stock_export")
+        else:
+            st.info("No items found that match: low stock, RC available, and no pending supply.")
 
 
+render_profile()
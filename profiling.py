@@ -0,0 +1,244 @@
+# Opt-in profiling of page reruns.
+#
+# Every widget interaction reruns a page top to bottom. Pages wrap their
+# logical sections in `with section("..."):` and the wall time of each
+# section is recorded, split into database time (the time during which at
+# least one query call reported by db_connection_updated was running while
+# the section was open) and everything else: pandas, grid and chart
+# construction, layout. Queries run concurrently overlap, so the plain sum of
+# their durations is kept separately as query_ms.
+#
+# Profiling is off unless [profiling] enabled = true is set in secrets.toml,
+# or the app is opened with ?profile=1 (?profile=0 turns it off again for
+# the session). Reruns are counted per session and page either way.
+import json
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+
+import altair as alt
+import pandas as pd
+import streamlit as st
+from streamlit.runtime.scriptrunner import get_script_run_ctx
+
+from query_metrics import set_page
+
+# Defaults, overridable from the [profiling] section of secrets.toml
+PROFILING_DEFAULTS = {
+    "enabled": False,
+    "history": 20,      # reruns kept per session
+}
+
+_ENABLED_KEY = "_profiling_enabled"
+_RERUNS_KEY = "_profiling_reruns"
+_HISTORY_KEY = "_profiling_history"
+
+
+def _union_ms(intervals):
+    """Total length of (start, end) intervals, counting overlaps once."""
+    total, covered_to = 0.0, None
+    for start, end in sorted(intervals):
+        if covered_to is None or start > covered_to:
+            total += end - start
+            covered_to = end
+        elif end > covered_to:
+            total += end - covered_to
+            covered_to = end
+    return total
+
+
+def _settings():
+    settings = dict(PROFILING_DEFAULTS)
+    if "profiling" in st.secrets:
+        settings.update(st.secrets["profiling"])
+    return settings
+
+
+class RerunProfile:
+    """Sections of one page rerun, in the order they started.
+
+    Section paths are ";"-joined like the stacks of a flame graph, and the
+    database time of a section includes that of the sections nested in it.
+    Every query call is kept as an interval of the rerun's clock; a section's
+    queries are those that finished while it was open.
+    """
+
+    def __init__(self, page, rerun):
+        self.page = page
+        self.rerun = rerun
+        self.started_at = time.time()
+        self.intervals = []
+        self.sections = []
+        self.ended_ms = None
+        self._origin = time.perf_counter()
+        self._open = []
+        self._lock = threading.Lock()
+
+    def _now_ms(self):
+        return (time.perf_counter() - self._origin) * 1000
+
+    @contextmanager
+    def section(self, name):
+        with self._lock:
+            path = ";".join([entry["path"] for entry in self._open[-1:]] + [name])
+            entry = {"path": path, "depth": len(self._open), "start_ms": self._now_ms(),
+                     "wall_ms": None, "first_query": len(self.intervals), "end_query": None}
+            self.sections.append(entry)
+            self._open.append(entry)
+        try:
+            yield
+        finally:
+            with self._lock:
+                entry["wall_ms"] = self._now_ms() - entry["start_ms"]
+                entry["end_query"] = len(self.intervals)
+                self._open.remove(entry)
+
+    def finish(self):
+        with self._lock:
+            if self.ended_ms is None:
+                self.ended_ms = self._now_ms()
+
+    def add_query(self, ms):
+        # Called when a query call returns, also from the worker threads of run_queries
+        with self._lock:
+            end = self._now_ms()
+            self.intervals.append((end - ms, end))
+
+    @staticmethod
+    def _db_times(intervals):
+        return {
+            "db_ms": _union_ms(intervals),
+            "query_ms": sum(end - start for start, end in intervals),
+            "queries": len(intervals),
+        }
+
+    def as_dict(self):
+        with self._lock:
+            now = self._now_ms() if self.ended_ms is None else self.ended_ms
+            intervals = list(self.intervals)
+            sections = [dict(entry) for entry in self.sections]
+        for entry in sections:
+            first, end = entry.pop("first_query"), entry.pop("end_query")
+            entry.update(self._db_times(intervals[first:end]))
+            entry["finished"] = entry["wall_ms"] is not None
+            if not entry["finished"]:
+                entry["wall_ms"] = now - entry["start_ms"]
+            entry["python_ms"] = max(entry["wall_ms"] - entry["db_ms"], 0.0)
+        return {
+            "page": self.page,
+            "rerun": self.rerun,
+            "started_at": self.started_at,
+            "total_ms": now,
+            **self._db_times(intervals),
+            "sections": sections,
+        }
+
+
+def _profiling_enabled():
+    flag = st.query_params.get("profile")
+    if flag is not None:
+        st.session_state[_ENABLED_KEY] = flag not in ("0", "false")
+    if _ENABLED_KEY not in st.session_state:
+        st.session_state[_ENABLED_KEY] = bool(_settings()["enabled"])
+    return st.session_state[_ENABLED_KEY]
+
+
+def _current_profile():
+    if get_script_run_ctx() is None:
+        return None
+    history = st.session_state.get(_HISTORY_KEY)
+    return history[-1] if history else None
+
+
+def start_rerun(page):
+    """Call at the top of each page: tags its queries and starts the rerun profile."""
+    set_page(page)
+    if get_script_run_ctx() is None:
+        return
+
+    reruns = st.session_state.setdefault(_RERUNS_KEY, {})
+    reruns[page] = reruns.get(page, 0) + 1
+
+    if not _profiling_enabled():
+        st.session_state.pop(_HISTORY_KEY, None)
+        return
+    history = st.session_state.get(_HISTORY_KEY)
+    if history is None:
+        history = st.session_state[_HISTORY_KEY] = deque(maxlen=_settings()["history"])
+    elif history:
+        history[-1].finish()   # in case the previous rerun stopped early
+    history.append(RerunProfile(page, reruns[page]))
+
+
+@contextmanager
+def section(name):
+    """Time a block of the page as one section of the current rerun profile."""
+    profile = _current_profile()
+    if profile is None:
+        yield
+        return
+    with profile.section(name):
+        yield
+
+
+def add_query(ms):
+    """Attribute a query call to the sections open in the current rerun."""
+    profile = _current_profile()
+    if profile is not None:
+        profile.add_query(ms)
+
+
+def _flame_chart(sections):
+    df = pd.DataFrame(sections)
+    df["end_ms"] = df["start_ms"] + df["wall_ms"]
+    df["name"] = df["path"].str.rsplit(";", n=1).str[-1]
+    df["db_share"] = (df["db_ms"] / df["wall_ms"].where(df["wall_ms"] > 0)).fillna(0)
+    bars = alt.Chart(df).mark_bar(stroke="white").encode(
+        x=alt.X("start_ms:Q", title="ms since rerun start"),
+        x2="end_ms:Q",
+        y=alt.Y("depth:O", title=None, axis=None),
+        color=alt.Color("db_share:Q", title="database share", scale=alt.Scale(domain=[0, 1], scheme="oranges")),
+        tooltip=["path", alt.Tooltip("wall_ms:Q", format=",.1f"), alt.Tooltip("db_ms:Q", format=",.1f"),
+                 alt.Tooltip("query_ms:Q", format=",.1f"),
+                 alt.Tooltip("python_ms:Q", format=",.1f"), "queries"],
+    )
+    labels = bars.mark_text(align="left", dx=3, color="black").encode(text="name")
+    return (bars + labels).properties(height=40 * (df["depth"].max() + 1))
+
+
+def render_profile():
+    """Profile of this session's reruns; call at the very end of the page."""
+    profile = _current_profile()
+    if profile is None:
+        return
+
+    profile.finish()
+    profiles = [entry.as_dict() for entry in st.session_state[_HISTORY_KEY]]
+    with st.expander(f"Rerun profile — {profile.page}, rerun {profile.rerun}"):
+        labels = [f"{entry['page']} #{entry['rerun']} ({entry['total_ms']:,.0f} ms)" for entry in profiles]
+        selected = profiles[labels.index(st.selectbox("Rerun", labels[::-1], key="_profiling_selected_rerun"))]
+
+        col1, col2, col3 = st.columns(3)
+        col1.metric("Rerun", f"{selected['total_ms']:,.0f} ms")
+        col2.metric(
+            "Database", f"{selected['db_ms']:,.0f} ms",
+            f"{selected['queries']} query calls, {selected['query_ms']:,.0f} ms summed", delta_color="off",
+        )
+        col3.metric("Python / UI", f"{max(selected['total_ms'] - selected['db_ms'], 0):,.0f} ms")
+
+        if selected["sections"]:
+            st.altair_chart(_flame_chart(selected["sections"]), use_container_width=True)
+            table = pd.DataFrame(selected["sections"])[[
+                "path", "wall_ms", "db_ms", "query_ms", "python_ms", "queries", "finished",
+            ]]
+            st.dataframe(table.round(1), hide_index=True, use_container_width=True)
+        st.caption("Reruns are timed up to this panel, which is not included.")
+
+        st.download_button(
+            "Download profiles (JSON)",
+            json.dumps(profiles, indent=2),
+            file_name="rerun_profiles.json",
+            mime="application/json",
+            key="_profiling_download",
+        )
@@ -0,0 +1,56 @@
+import re
+
+# String literals and quoted identifiers are kept; -- comments and runs of
+# whitespace outside them are not
+_SQL_TOKENS = re.compile(r"""('(?:[^']|'')*'|"(?:[^"]|"")*")|(?:--[^\n]*|\s)+""")
+
+
+def normalize_sql(query):
+    """One-line form of a query, for cache keys and the query metrics.
+
+    Drops -- comments, collapses whitespace and removes the trailing
+    semicolon. Comments go before the lines are joined, so a comment
+    cannot swallow the rest of the statement.
+    """
+    query = _SQL_TOKENS.sub(lambda m: m.group(1) or " ", query)
+    return query.strip().rstrip(";").strip()
+
+
+class Where:
+    """Composable WHERE clause whose values travel as bound parameters.
+
+    Conditions are joined with AND. Use with run_query:
+
+        where = Where().eq("warehouse_name", selected_cms)
+        run_query(f"SELECT ... FROM stock_data {where.sql()}", where.params)
+    """
+
+    def __init__(self):
+        self.conditions = []
+        self.params = []
+
+    def add(self, condition, *params):
+        """Add a raw condition; it must contain one %s per parameter.
+
+        The condition is parenthesized, so an OR inside it cannot escape
+        the surrounding AND.
+        """
+        self.conditions.append(f"({condition})")
+        self.params.extend(params)
+        return self
+
+    def eq(self, column, value):
+        return self.add(f"{column} = %s", value)
+
+    def extend(self, other):
+        self.conditions.extend(other.conditions)
+        self.params.extend(other.params)
+        return self
+
+    def sql(self, keyword="WHERE"):
+        if not self.conditions:
+            return ""
+        return f"{keyword} " + " AND ".join(self.conditions)
+
+    def __bool__(self):
+        return bool(self.conditions)
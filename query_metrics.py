@@ -0,0 +1,103 @@
+# Per-execution query metrics, kept in memory for the Query Metrics page.
+#
+# run_query, fetch_one and run_prepared record one QueryRecord per call:
+# the page and logical query name, connection wait, execution and fetch
+# time, rows and result size. Calls answered from the result cache are
+# recorded too, with zero timings. Optionally, statements slower than
+# slow_ms get their EXPLAIN (ANALYZE, BUFFERS) plan captured.
+import threading
+import time
+from collections import deque
+from dataclasses import dataclass, field
+
+import pandas as pd
+import streamlit as st
+from streamlit.runtime.scriptrunner import get_script_run_ctx
+
+# Defaults, overridable from the [query_metrics] section of secrets.toml
+METRICS_DEFAULTS = {
+    "max_records": 5000,      # ring buffer size
+    "slow_ms": 500,           # execution time that counts as slow
+    "explain_slow": False,    # re-run slow statements under EXPLAIN ANALYZE
+}
+
+_PAGE_KEY = "_query_metrics_page"
+
+
+@dataclass
+class QueryRecord:
+    name: str
+    page: str
+    sql: str
+    params: str
+    cached: bool = False
+    engine: str = "postgres"   # or "duckdb" when answered from the snapshot
+    wait_ms: float = 0.0       # waiting for a pooled connection
+    execute_ms: float = 0.0    # cursor.execute, i.e. until Postgres returned
+    fetch_ms: float = 0.0      # fetching rows and building the DataFrame
+    rows: int = 0
+    result_bytes: int = 0      # in-memory size of the result
+    plan: str = None
+    at: float = field(default_factory=time.time)
+
+    @property
+    def total_ms(self):
+        return self.wait_ms + self.execute_ms + self.fetch_ms
+
+
+class QueryMetrics:
+    """Thread-safe ring buffer of the most recent QueryRecords."""
+
+    def __init__(self, max_records=5000, slow_ms=500, explain_slow=False):
+        self.slow_ms = slow_ms
+        self.explain_slow = explain_slow
+        self._records = deque(maxlen=max_records)
+        self._lock = threading.Lock()
+
+    def record(self, record):
+        with self._lock:
+            self._records.append(record)
+
+    def is_slow(self, record):
+        return record.execute_ms >= self.slow_ms
+
+    def records(self):
+        with self._lock:
+            return list(self._records)
+
+    def clear(self):
+        with self._lock:
+            self._records.clear()
+
+    def frame(self):
+        records = self.records()
+        return pd.DataFrame(
+            [{**vars(record), "total_ms": record.total_ms} for record in records],
+            columns=[*QueryRecord.__dataclass_fields__, "total_ms"],
+        )
+
+
+@st.cache_resource
+def get_query_metrics():
+    """Process-wide metrics buffer shared across Streamlit sessions."""
+    settings = dict(METRICS_DEFAULTS)
+    if "query_metrics" in st.secrets:
+        settings.update(st.secrets["query_metrics"])
+    return QueryMetrics(**settings)
+
+
+def set_page(name):
+    """Tag the queries of this script run with the page name; call at the top of each page."""
+    if get_script_run_ctx() is not None:
+        st.session_state[_PAGE_KEY] = name
+
+
+def current_page():
+    if get_script_run_ctx() is None:
+        return None
+    return st.session_state.get(_PAGE_KEY)
+
+
+def describe_params(params, limit=200):
+    text = "" if params is None else repr(params)
+    return text if len(text) <= limit else text[:limit] + "..."
@@ -0,0 +1,114 @@
+# Admin view of the query metrics.
+#
+# It is not a file under pages/, so it has no sidebar entry: Dashboard.py
+# renders it instead of the dashboard when the app is opened with
+# ?admin=query-metrics, and it stays locked unless [admin] password is set
+# in secrets.toml.
+import hmac
+
+import altair as alt
+import pandas as pd
+import streamlit as st
+
+from query_metrics import get_query_metrics
+
+# Query parameter value that opens this page
+ADMIN_PAGE = "query-metrics"
+
+
+def render_query_metrics_page():
+    """Per-query latency summary, histogram and slowest statements, after the password check."""
+    admin_password = st.secrets["admin"].get("password") if "admin" in st.secrets else None
+    if not admin_password:
+        st.info("This page is disabled.")
+        return
+
+    if not st.session_state.get("query_metrics_unlocked"):
+        password = st.text_input("Admin password", type="password")
+        if not password:
+            return
+        if not hmac.compare_digest(password, admin_password):
+            st.error("Wrong password.")
+            return
+        st.session_state.query_metrics_unlocked = True
+
+    st.title("Query Metrics")
+
+    metrics = get_query_metrics()
+    records = metrics.frame()
+
+    st.caption(
+        f"Last {len(records):,} query calls in this process. Statements executing for "
+        f"{metrics.slow_ms} ms or more count as slow"
+        + (" and have their EXPLAIN (ANALYZE, BUFFERS) plan captured." if metrics.explain_slow else ".")
+    )
+
+    if st.button("Clear"):
+        metrics.clear()
+        st.rerun()
+
+    if records.empty:
+        return
+
+    pages = sorted(records["page"].unique())
+    selected_pages = st.multiselect("Pages", pages, default=pages)
+    records = records[records["page"].isin(selected_pages)]
+    executed = records[~records["cached"]]
+
+    #######################
+    # Per-query summary
+
+    summary = records.groupby(["page", "name", "engine"]).agg(
+        calls=("name", "size"),
+        cache_hits=("cached", "sum"),
+    )
+    summary["cache_hit_%"] = (summary["cache_hits"] / summary["calls"] * 100).round(1)
+    summary = summary.join(
+        executed.groupby(["page", "name", "engine"]).agg(
+            executions=("name", "size"),
+            p50_ms=("total_ms", "median"),
+            p95_ms=("total_ms", lambda ms: ms.quantile(0.95)),
+            max_ms=("total_ms", "max"),
+            wait_ms=("wait_ms", "mean"),
+            execute_ms=("execute_ms", "mean"),
+            fetch_ms=("fetch_ms", "mean"),
+            rows=("rows", "mean"),
+            result_kib=("result_bytes", lambda nbytes: nbytes.mean() / 1024),
+        )
+    ).round(1)
+
+    st.subheader("Queries")
+    st.dataframe(summary.sort_values("p95_ms", ascending=False), use_container_width=True)
+
+    #######################
+    # Latency histogram of one query
+
+    st.subheader("Latency distribution")
+    names = sorted(executed["name"].unique())
+    if names:
+        selected_name = st.selectbox("Query", names)
+        latencies = executed.loc[executed["name"] == selected_name, ["page", "wait_ms", "execute_ms", "fetch_ms", "total_ms"]]
+        chart = alt.Chart(latencies).mark_bar().encode(
+            x=alt.X("total_ms:Q", bin=alt.Bin(maxbins=40), title="total ms"),
+            y=alt.Y("count():Q", title="calls"),
+            color="page:N",
+        )
+        st.altair_chart(chart, use_container_width=True)
+
+    #######################
+    # Slowest recent statements
+
+    st.subheader("Slowest statements")
+    slowest = executed.nlargest(20, "total_ms")
+    for record in slowest.itertuples():
+        at = pd.Timestamp(record.at, unit="s").strftime("%d-%b %H:%M:%S")
+        with st.expander(f"{record.total_ms:,.0f} ms — {record.page or '?'} / {record.name} ({at})"):
+            st.write(
+                f"{record.engine} · wait {record.wait_ms:,.1f} ms · execute {record.execute_ms:,.1f} ms · "
+                f"fetch {record.fetch_ms:,.1f} ms · {record.rows:,} rows · {record.result_bytes / 1024:,.1f} KiB"
+            )
+            if record.params:
+                st.caption(f"params: {record.params}")
+            st.code(record.sql, language="sql")
+            if record.plan:
+                st.code(record.plan, language="text")
@@ -0,0 +1,93 @@
+# Process-wide copy of the reference data the pages look up on every rerun:
+# the item_master attributes and the list of warehouses. It is loaded once
+# per data version and shared by all sessions, so pages join against it in
+# memory instead of asking Postgres again.
+import threading
+from dataclasses import dataclass
+
+import numpy as np
+import pandas as pd
+import streamlit as st
+
+from db_connection_updated import connection, data_version
+
+# item_master attribute -> drill-down column label
+ITEM_ATTRIBUTES = {
+    "item_name": "Item Name",
+    "eml_aml_type": "EML/AML",
+    "priority_item": "Priority Status",
+    "type_cons_dem": "Cons/Dem Type",
+}
+
+# Few distinct values; stored as categoricals
+_CATEGORICAL = ["eml_aml_type", "priority_item", "type_cons_dem"]
+
+
+@dataclass(frozen=True)
+class ReferenceData:
+    items: pd.DataFrame        # ITEM_ATTRIBUTES columns, indexed by item_code
+    warehouses: np.ndarray     # distinct stock_data warehouse names, sorted
+
+    def item_attributes(self, item_codes):
+        """Item attributes for item_codes, in the same order (NaN for unknown codes)."""
+        return self.items.reindex(pd.Index(item_codes, name="item_code"))
+
+    def join_items(self, df, on="Item Code"):
+        """Add the labelled item attributes after the `on` column of df."""
+        attributes = self.item_attributes(df[on]).rename(columns=ITEM_ATTRIBUTES)
+        attributes.index = df.index
+        position = df.columns.get_loc(on) + 1
+        return pd.concat(
+            [df.iloc[:, :position], attributes.astype(object), df.iloc[:, position:]],
+            axis=1,
+        )
+
+
+def load_reference_data(conn):
+    items = pd.read_sql(
+        f"SELECT item_code, {', '.join(ITEM_ATTRIBUTES)} FROM item_master ORDER BY item_code",
+        conn,
+    )
+    warehouses = pd.read_sql(
+        "SELECT DISTINCT warehouse_name FROM stock_data ORDER BY warehouse_name", conn
+    )
+    items = items.drop_duplicates("item_code").set_index("item_code")
+    for column in _CATEGORICAL:
+        items[column] = items[column].astype("category")
+    return ReferenceData(items=items, warehouses=warehouses["warehouse_name"].to_numpy())
+
+
+class ReferenceStore:
+    """Holds the ReferenceData of the current data version."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._version = None
+        self._data = None
+
+    def get(self, version, load):
+        with self._lock:
+            if self._version == version:
+                return self._data
+        # Load outside the lock, like the query cache; a concurrent load of
+        # the same version only costs one extra query
+        data = load()
+        with self._lock:
+            if self._version is None or version >= self._version:
+                self._version, self._data = version, data
+        return data
+
+
+@st.cache_resource
+def get_reference_store():
+    return ReferenceStore()
+
+
+def _load():
+    with connection() as conn:
+        return load_reference_data(conn)
+
+
+def reference_data():
+    """ReferenceData for the current data version."""
+    return get_reference_store().get(data_version(), _load)
@@ -0,0 +1,184 @@
+# Optional read engine: a columnar snapshot of the dashboard tables.
+#
+# After every upload the tables the pages read are exported to Parquet
+# files, and the page queries named in [snapshot] queries are answered by
+# an embedded DuckDB over those files instead of by Postgres, which the
+# uploads write to. DuckDB is not a requirement of the app: without it, or
+# with [snapshot] enabled = false (the default), every query goes to
+# Postgres. db_connection_updated does the routing.
+import os
+import re
+import shutil
+import threading
+import time
+import uuid
+
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+try:
+    import duckdb
+except ImportError:   # optional dependency, see above
+    duckdb = None
+
+# Defaults, overridable from the [snapshot] section of secrets.toml
+SNAPSHOT_DEFAULTS = {
+    "enabled": False,
+    "path": "snapshot",       # directory for the Parquet files
+    # run_query names answered from the snapshot; each must also be valid
+    # DuckDB SQL and return its rows in the same order as Postgres. DuckDB
+    # sorts text by byte order, not by the Postgres collation, so
+    # drilldown_page (keyset pages on item_code) and distribution_chart
+    # (sorted by warehouse_name) stay on Postgres. zero_stock stays there too,
+    # to keep the Distribution page on one engine. expiring_rc uses TO_CHAR.
+    "queries": ["metrics", "rc_counts", "no_rc", "low_stock_no_supply"],
+}
+
+# Everything the routed queries read
+SNAPSHOT_TABLES = [
+    "item_master",
+    "stock_data",
+    "purchase_order_data",
+    "rate_contract_data",
+    "consumption_reference",
+    "demand_reference",
+    "item_state_summary",
+    "stock_bucket_summary",
+]
+
+SNAPSHOT_CHUNK_ROWS = 50_000
+
+# Postgres type OID -> Parquet column type; anything else is stored as text.
+# numeric becomes double, as run_query's coerce_float already does.
+ARROW_TYPES = {
+    16: pa.bool_(),
+    20: pa.int64(),
+    21: pa.int16(),
+    23: pa.int32(),
+    700: pa.float32(),
+    701: pa.float64(),
+    1700: pa.float64(),
+    1082: pa.date32(),
+    1114: pa.timestamp("us"),
+    1184: pa.timestamp("us", tz="UTC"),
+}
+
+_PLACEHOLDER = re.compile(r"%\((\w+)\)s|%s|%%")
+
+
+def to_duckdb_sql(query, params):
+    """psycopg2 placeholders (%s, %(name)s, %%) as DuckDB ones (?, $name, %)."""
+    if params is None:
+        # psycopg2 leaves the query alone too when there are no params
+        return query
+
+    def replace(match):
+        if match.group(1):
+            return f"${match.group(1)}"
+        return "?" if match.group(0) == "%s" else "%"
+
+    return _PLACEHOLDER.sub(replace, query)
+
+
+def export_table(conn, table, path, chunk_rows=SNAPSHOT_CHUNK_ROWS):
+    """Stream a Postgres table into a Parquet file through a server-side cursor."""
+    with conn.cursor(name=f"snapshot_{table}") as cur:
+        cur.itersize = chunk_rows
+        cur.execute(f"SELECT * FROM {table}")
+        rows = cur.fetchmany(chunk_rows)
+        columns = [column.name for column in cur.description]
+        schema = pa.schema([
+            (column.name, ARROW_TYPES.get(column.type_code, pa.string())) for column in cur.description
+        ])
+        with pq.ParquetWriter(path, schema) as writer:
+            while True:
+                df = pd.DataFrame.from_records(rows, columns=columns, coerce_float=True)
+                writer.write_table(pa.Table.from_pandas(df, schema=schema, preserve_index=False))
+                rows = cur.fetchmany(chunk_rows)
+                if not rows:
+                    break
+
+
+class Snapshot:
+    """Parquet snapshot of SNAPSHOT_TABLES, queried through DuckDB views.
+
+    `version` is the data version the files were exported at; callers only
+    read from the snapshot while it matches the current data version.
+    """
+
+    def __init__(self, path, queries):
+        self.path = path
+        self.queries = set(queries)
+        self.version = None         # None until the first export has finished
+        self.error = None           # why the last export failed, if it did
+        self.unsupported = set()    # routed queries DuckDB cannot compile; they stay on Postgres
+        self._directory = None
+        self._lock = threading.Lock()
+        self._db = duckdb.connect()
+        # Postgres puts NULLs last in ascending and first in descending order
+        self._db.execute("SET default_null_order = 'nulls_last_on_asc_first_on_desc'")
+
+    def serves(self, name, version):
+        return self.version == version and name in self.queries and name not in self.unsupported
+
+    def refresh(self, conn, version):
+        """Export every table from one consistent Postgres snapshot and switch the views to it."""
+        directory = os.path.join(self.path, f"{time.strftime('%Y%m%d-%H%M%S')}-{uuid.uuid4().hex[:8]}")
+        os.makedirs(directory)
+        try:
+            with conn.cursor() as cur:
+                # All tables as of one moment, even if an upload commits meanwhile
+                cur.execute("SET TRANSACTION ISOLATION LEVEL REPEATABLE READ, READ ONLY")
+            for table in SNAPSHOT_TABLES:
+                export_table(conn, table, os.path.join(directory, f"{table}.parquet"))
+        except Exception:
+            shutil.rmtree(directory, ignore_errors=True)
+            raise
+        finally:
+            conn.rollback()
+
+        with self._lock:
+            for table in SNAPSHOT_TABLES:
+                file = os.path.join(directory, f"{table}.parquet").replace("'", "''")
+                self._db.execute(f"CREATE OR REPLACE VIEW {table} AS SELECT * FROM read_parquet('{file}')")
+            previous, self._directory = self._directory, directory
+            self.version = version
+            self.error = None
+            # Give every routed query another chance against the new files
+            self.unsupported.clear()
+
+        # Keep the previous files for queries still reading them; drop older ones
+        keep = {os.path.basename(directory), os.path.basename(previous or "")}
+        for entry in os.listdir(self.path):
+            if entry not in keep:
+                shutil.rmtree(os.path.join(self.path, entry), ignore_errors=True)
+
+    def read(self, query, params, record):
+        """Run a page query on the snapshot, filling in the record's timings.
+
+        Returns None when DuckDB cannot run the query and the caller falls
+        back to Postgres. Queries DuckDB cannot parse or bind are marked
+        unsupported until the next refresh; other errors (e.g. reading files
+        that were just swapped) only affect this call.
+        """
+        with self._lock:
+            cur = self._db.cursor()   # DuckDB connections are used one per thread
+        try:
+            start = time.perf_counter()
+            cur.execute(to_duckdb_sql(query, params), params)
+            record.execute_ms = (time.perf_counter() - start) * 1000
+            start = time.perf_counter()
+            df = cur.df()
+            record.fetch_ms = (time.perf_counter() - start) * 1000
+        except (duckdb.ParserException, duckdb.BinderException, duckdb.CatalogException):
+            self.unsupported.add(record.name)
+            return None
+        except duckdb.Error:
+            return None
+        finally:
+            cur.close()
+        record.engine = "duckdb"
+        record.rows = len(df)
+        record.result_bytes = int(df.memory_usage(index=True, deep=True).sum())
+        return df
@@ -0,0 +1,37 @@
+# Stock position buckets, in display order
+ABOVE_3 = ">3 months"
+MID_1_3 = "1-3 months"
+BELOW_1 = "<1 month"
+NO_STOCK = "No Stock"
+
+BUCKETS = [ABOVE_3, MID_1_3, BELOW_1, NO_STOCK]
+
+# Bucket rules as SQL predicates, for queries that count or filter in Postgres:
+# an item with no stock is "No Stock" whatever its position; otherwise the
+# position decides, and a zero position with stock on hand is "<1 month".
+# {pos} and {qty} must already be NULL-safe expressions (e.g. COALESCE(col, 0)).
+SQL_RULES = {
+    ABOVE_3: "{qty} > 0 AND {pos} > 3",
+    MID_1_3: "{qty} > 0 AND {pos} > 1 AND {pos} <= 3",
+    BELOW_1: "{qty} > 0 AND {pos} <= 1",
+    NO_STOCK: "{qty} <= 0",
+}
+
+# The Dashboard metric tiles and their drill-down lists keep their own rules.
+# They bucket on the position alone and only look at the quantity when the
+# position is zero. So a positive position with no stock on hand stays in its
+# position tile, and a negative position or quantity is in no tile. Deriving
+# them from SQL_RULES would move those rows into other tiles (see
+# tests/test_stock_buckets.py for every boundary).
+TILE_SQL_RULES = {
+    ABOVE_3: "{pos} > 3",
+    MID_1_3: "{pos} > 1 AND {pos} <= 3",
+    BELOW_1: "({pos} > 0 AND {pos} <= 1) OR ({pos} = 0 AND {qty} > 0)",
+    NO_STOCK: "{pos} = 0 AND {qty} = 0",
+}
+
+
+def sql_condition(bucket, pos, qty, rules=SQL_RULES):
+    """SQL predicate selecting the rows of one bucket."""
+    return rules[bucket].format(pos=pos, qty=qty)
+
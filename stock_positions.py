@@ -0,0 +1,117 @@
+# Stock positions (months of stock) on stock_data.
+#
+# stock_pos_cons    = stock against the consumption reference
+# stock_pos_con_dem = stock against consumption or demand, per item_master.type_cons_dem
+#
+# Statement-level triggers on stock_data, consumption_reference and
+# demand_reference recompute the positions of just the (item, warehouse)
+# pairs a statement touched. recalculate_all() remains as the full rebuild
+# behind the "Recalculate Stock Positions" button, e.g. after item_master
+# changes, which the triggers do not watch.
+
+# Session flag set by recalculate_all so the triggers skip its own UPDATE
+SKIP_TRIGGERS_SETTING = "dashboard.skip_position_triggers"
+
+STOCK_POSITION_FUNCTION = """
+    CREATE OR REPLACE FUNCTION stock_position(qty numeric, ref numeric)
+    RETURNS numeric
+    LANGUAGE sql IMMUTABLE
+    AS $$
+        SELECT CASE
+            WHEN ref > 0 THEN ROUND((qty / ref) * 12, 2)
+            WHEN ref IS NULL OR ref = 0 THEN
+                CASE WHEN qty > 0 THEN 3.00 ELSE 0.00 END
+        END
+    $$
+"""
+
+
+def _positions_update(pairs_join=""):
+    """UPDATE of both positions, optionally restricted by a join on the changed pairs."""
+    return f"""
+        UPDATE stock_data sd
+        SET
+            stock_pos_cons = p.stock_pos_cons,
+            stock_pos_con_dem = p.stock_pos_con_dem
+        FROM (
+            SELECT
+                s.item_code,
+                s.warehouse_name,
+                stock_position(s.stock_quantity, cr.cons_qty_ref) AS stock_pos_cons,
+                CASE im.type_cons_dem
+                    WHEN 'cons' THEN stock_position(s.stock_quantity, cr.cons_qty_ref)
+                    WHEN 'dem' THEN stock_position(s.stock_quantity, dr.dem_qty_ref)
+                END AS stock_pos_con_dem
+            FROM stock_data s
+            {pairs_join}
+            LEFT JOIN item_master im ON im.item_code = s.item_code
+            LEFT JOIN consumption_reference cr ON cr.item_code = s.item_code AND cr.warehouse_name = s.warehouse_name
+            LEFT JOIN demand_reference dr ON dr.item_code = s.item_code AND dr.warehouse_name = s.warehouse_name
+        ) AS p
+        WHERE sd.item_code = p.item_code AND sd.warehouse_name = p.warehouse_name
+          AND (sd.stock_pos_cons, sd.stock_pos_con_dem) IS DISTINCT FROM (p.stock_pos_cons, p.stock_pos_con_dem)
+    """
+
+
+TRIGGER_FUNCTION = f"""
+    CREATE OR REPLACE FUNCTION refresh_changed_stock_positions()
+    RETURNS trigger
+    LANGUAGE plpgsql
+    AS $fn$
+    BEGIN
+        -- Our own UPDATE of stock_data fires the stock_data triggers again,
+        -- and recalculate_all() rewrites every row itself.
+        IF pg_trigger_depth() > 1
+           OR current_setting('{SKIP_TRIGGERS_SETTING}', true) = 'on' THEN
+            RETURN NULL;
+        END IF;
+
+        {_positions_update(
+            "JOIN (SELECT DISTINCT item_code, warehouse_name FROM changed_rows) ch "
+            "ON ch.item_code = s.item_code AND ch.warehouse_name = s.warehouse_name"
+        )};
+        RETURN NULL;
+    END
+    $fn$
+"""
+
+# (table, event, transition table). Transition tables allow only one event per trigger.
+WATCHED = [
+    ("stock_data", "INSERT", "NEW"),
+    ("stock_data", "UPDATE", "NEW"),
+    ("consumption_reference", "INSERT", "NEW"),
+    ("consumption_reference", "UPDATE", "NEW"),
+    ("consumption_reference", "DELETE", "OLD"),
+    ("demand_reference", "INSERT", "NEW"),
+    ("demand_reference", "UPDATE", "NEW"),
+    ("demand_reference", "DELETE", "OLD"),
+]
+
+
+def trigger_ddl():
+    statements = [STOCK_POSITION_FUNCTION, TRIGGER_FUNCTION]
+    for table, event, transition in WATCHED:
+        name = f"{table}_{event.lower()}_stock_positions"
+        statements.append(f"DROP TRIGGER IF EXISTS {name} ON {table}")
+        statements.append(f"""
+            CREATE TRIGGER {name}
+            AFTER {event} ON {table}
+            REFERENCING {transition} TABLE AS changed_rows
+            FOR EACH STATEMENT EXECUTE FUNCTION refresh_changed_stock_positions()
+        """)
+    return statements
+
+
+def install_stock_position_triggers(cur):
+    """Install (or update) the position function and triggers (run by db_migrations)."""
+    for statement in trigger_ddl():
+        cur.execute(statement)
+
+
+def recalculate_all(cur):
+    """Full rebuild of every stock position, in the caller's transaction."""
+    cur.execute(f"SET LOCAL {SKIP_TRIGGERS_SETTING} = 'on'")
+    cur.execute(_positions_update())
+    updated = cur.rowcount
+    cur.execute(f"SET LOCAL {SKIP_TRIGGERS_SETTING} = 'off'")
+    return updated
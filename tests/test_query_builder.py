@@ -0,0 +1,37 @@
+from query_builder import Where, normalize_sql
+
+
+def test_normalize_sql_collapses_whitespace_and_semicolon():
+    assert normalize_sql("\n  SELECT a,\n\t b\n  FROM t ;\n") == "SELECT a, b FROM t"
+
+
+def test_normalize_sql_keeps_literals_and_quoted_identifiers():
+    query = """SELECT '  two  spaces -- not a comment' AS "Supply  --  %" FROM t"""
+    assert normalize_sql(query) == query
+
+
+def test_normalize_sql_drops_line_comments():
+    query = """
+        SELECT
+            rc.supplier AS "Supplier Name",
+            --rc.rate AS "Rate",
+            rc.contract_to_date AS "Contract End Date" -- trailing note
+        FROM rc_data rc
+    """
+    assert normalize_sql(query) == (
+        'SELECT rc.supplier AS "Supplier Name", rc.contract_to_date AS "Contract End Date" FROM rc_data rc'
+    )
+
+
+def test_where_keeps_or_conditions_inside_the_and():
+    where = Where().add("a.qty > 0 OR a.pos = 0").eq("a.warehouse_name", "CMS 1")
+    assert where.sql() == "WHERE (a.qty > 0 OR a.pos = 0) AND (a.warehouse_name = %s)"
+    assert where.params == ["CMS 1"]
+
+
+def test_where_extend_and_empty():
+    assert Where().sql() == ""
+    assert not Where()
+    where = Where().add("a.item_code > %s", "X1").extend(Where().add("s.priority_item = 'Yes' OR s.pinned"))
+    assert where.sql("AND") == "AND (a.item_code > %s) AND (s.priority_item = 'Yes' OR s.pinned)"
+    assert where.params == ["X1"]
@@ -0,0 +1,83 @@
+import sqlite3
+
+import pandas as pd
+import pytest
+
+from stock_buckets import (
+    ABOVE_3, MID_1_3, BELOW_1, NO_STOCK, BUCKETS, SQL_RULES, TILE_SQL_RULES, sql_condition,
+)
+
+# One row per boundary: stock position 0 / 1 / 3 and just past them, with
+# stock on hand, none, and a negative quantity (returns booked against it)
+FRAME = pd.DataFrame(
+    [
+        ("pos_4", 4, 10),
+        ("pos_3", 3, 10),
+        ("pos_1_5", 1.5, 10),
+        ("pos_1", 1, 10),
+        ("pos_0_5", 0.5, 10),
+        ("pos_0", 0, 10),
+        ("pos_0_qty_0", 0, 0),
+        ("pos_0_qty_neg", 0, -5),
+        ("pos_4_qty_0", 4, 0),
+        ("pos_2_qty_neg", 2, -5),
+        ("pos_neg", -1, 10),
+        ("pos_null", None, 10),
+    ],
+    columns=["name", "stock_pos", "stock_quantity"],
+)
+
+# Shared rules (Distribution chart, stock_bucket_summary): no stock wins
+SHARED = {
+    "pos_4": ABOVE_3,
+    "pos_3": MID_1_3,
+    "pos_1_5": MID_1_3,
+    "pos_1": BELOW_1,
+    "pos_0_5": BELOW_1,
+    "pos_0": BELOW_1,
+    "pos_0_qty_0": NO_STOCK,
+    "pos_0_qty_neg": NO_STOCK,
+    "pos_4_qty_0": NO_STOCK,
+    "pos_2_qty_neg": NO_STOCK,
+    "pos_neg": BELOW_1,
+    "pos_null": BELOW_1,
+}
+
+# Dashboard tiles: the position decides; quantity only splits position 0
+TILES = {
+    "pos_4": ABOVE_3,
+    "pos_3": MID_1_3,
+    "pos_1_5": MID_1_3,
+    "pos_1": BELOW_1,
+    "pos_0_5": BELOW_1,
+    "pos_0": BELOW_1,
+    "pos_0_qty_0": NO_STOCK,
+    "pos_0_qty_neg": None,
+    "pos_4_qty_0": ABOVE_3,
+    "pos_2_qty_neg": MID_1_3,
+    "pos_neg": None,
+    "pos_null": BELOW_1,
+}
+
+
+def sql_buckets(rules):
+    """name -> the buckets whose SQL predicate selects that row."""
+    with sqlite3.connect(":memory:") as db:
+        FRAME.to_sql("stock", db, index=False)
+        matches = {name: [] for name in FRAME["name"]}
+        for bucket in BUCKETS:
+            condition = sql_condition(bucket, "COALESCE(stock_pos, 0)", "COALESCE(stock_quantity, 0)", rules=rules)
+            for (name,) in db.execute(f"SELECT name FROM stock WHERE {condition}"):
+                matches[name].append(bucket)
+    return matches
+
+
+@pytest.mark.parametrize("name", FRAME["name"])
+def test_shared_rules_put_every_row_in_one_bucket(name):
+    assert sql_buckets(SQL_RULES)[name] == [SHARED[name]]
+
+
+@pytest.mark.parametrize("name", FRAME["name"])
+def test_tile_rules_keep_dashboard_semantics(name):
+    expected = [TILES[name]] if TILES[name] else []
+    assert sql_buckets(TILE_SQL_RULES)[name] == expected
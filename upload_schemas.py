@@ -0,0 +1,151 @@
+# Declarative description of every dataset the Upload Page accepts.
+#
+# Each Dataset maps the columns of the uploaded file onto its target table;
+# ingest.ingest() drives all of them through the same clean -> COPY path.
+# The natural key identifies a row across uploads for delta loads, which
+# need it to be unique (checked by ingest.validate_delta).
+# Adding a dataset is a new entry in DATASETS.
+from dataclasses import dataclass, field
+from datetime import date
+
+
+@dataclass(frozen=True)
+class Column:
+    target: str                # column in the database table
+    source: str = None         # header in the uploaded file; None -> use default
+    kind: str = "text"         # text | code | int | float | date (see ingest.CONVERTERS)
+    default: object = None     # value, or callable returning one, when source is None
+    tracked: bool = True       # False -> a change in this column alone is not a change
+
+
+@dataclass(frozen=True)
+class Dataset:
+    key: str                   # file_uploader key
+    name: str                  # short name used in labels, e.g. "PO"
+    header: str
+    uploader_label: str
+    table: str
+    natural_key: tuple         # columns identifying a row across uploads
+    columns: tuple
+    checks: dict = field(default_factory=dict)   # description -> predicate selecting bad rows
+
+    @property
+    def column_names(self):
+        return [column.target for column in self.columns]
+
+    @property
+    def value_columns(self):
+        return [column.target for column in self.columns if column.target not in self.natural_key]
+
+    @property
+    def natural_key_index(self):
+        return f"{self.table}_natural_key_idx"
+
+    def key_expressions(self, alias=None):
+        """The natural key as NULL-safe expressions, exactly as in the natural-key index.
+
+        A missing value (e.g. an RC without supplier) counts as the empty
+        string, so two such rows for the same item are duplicates.
+        """
+        prefix = f"{alias}." if alias else ""
+        return [f"COALESCE({prefix}{column}::text, '')" for column in self.natural_key]
+
+    @property
+    def tracked_columns(self):
+        return [column.target for column in self.columns
+                if column.tracked and column.target not in self.natural_key]
+
+
+NO_ITEM_CODE = {"have no item code": "item_code IS NULL OR item_code = ''"}
+NO_WAREHOUSE = {"have no warehouse name": "warehouse_name IS NULL OR warehouse_name = ''"}
+
+
+DATASETS = {
+    "stock": Dataset(
+        key="stock",
+        name="Stock",
+        header="Upload Stock Data",
+        uploader_label="Upload Stock CSV or Excel",
+        table="stock_data",
+        natural_key=("item_code", "warehouse_name"),
+        columns=(
+            Column("item_code", "Item Code"),
+            Column("warehouse_name", "Warehouse Name"),
+            Column("stock_quantity", "Stock Quantity", "int"),
+        ),
+        checks={**NO_ITEM_CODE, **NO_WAREHOUSE},
+    ),
+    "po": Dataset(
+        key="po",
+        name="PO",
+        header="Upload Purchase Order Data",
+        uploader_label="Upload PO CSV or Excel",
+        table="purchase_order_data",
+        natural_key=("po_number", "item_code"),
+        columns=(
+            Column("entry_date", default=date.today, tracked=False),
+            Column("po_number", "PO NO", "code"),
+            Column("po_date", "PO DATE", "date"),
+            Column("item_code", "Item Code"),
+            Column("supplier", "SUPPLIER"),
+            Column("rate", "RATE", "float"),
+            Column("rate_unit", "RATE UNIT"),
+            Column("po_qty", "PO QTY", "int"),
+            Column("po_value", "PO VALUE (Rs.)", "float"),
+            Column("received_qty", "RECEIVED QTY", "int"),
+            Column("received_value", "RECEIVED VALUE (Rs.)", "float"),
+            Column("supply_status", "SUPPLY STATUS (%)", "float"),
+            Column("tender_number", "Tender No.", "code"),
+            Column("scheduled_delivery_date", "Scheduled Delivery Date", "date"),
+            Column("extended_delivery_period_days", "Extended Delivery Period (in Days)", "int"),
+        ),
+        checks={**NO_ITEM_CODE, "have no PO number": "po_number IS NULL OR po_number = ''"},
+    ),
+    "rc": Dataset(
+        key="rc",
+        name="RC",
+        header="Upload Rate Contract Data",
+        uploader_label="Upload RC CSV or Excel",
+        table="rate_contract_data",
+        natural_key=("item_code", "supplier", "rate_contract_level"),
+        columns=(
+            Column("item_code", "Item Code"),
+            Column("supplier", "Supplier"),
+            Column("rate", "Rate", "float"),
+            Column("rate_unit", "RATE UNIT"),
+            Column("tender_date", "Tender Date", "date"),
+            Column("contract_from_date", "Contract From Date", "date"),
+            Column("contract_to_date", "Contract To Date", "date"),
+            Column("rate_contract_level", "Rate Contract Level", "code"),
+        ),
+        checks=NO_ITEM_CODE,
+    ),
+    "consumption": Dataset(
+        key="consumption",
+        name="Consumption",
+        header="Upload Consumption Reference Data",
+        uploader_label="Upload Consumption CSV or Excel",
+        table="consumption_reference",
+        natural_key=("item_code", "warehouse_name"),
+        columns=(
+            Column("item_code", "Item Code"),
+            Column("warehouse_name", "Warehouse Name"),
+            Column("cons_qty_ref", "Consumption Qty", "int"),
+        ),
+        checks={**NO_ITEM_CODE, **NO_WAREHOUSE},
+    ),
+    "demand": Dataset(
+        key="demand",
+        name="Demand",
+        header="Upload Demand Reference Data",
+        uploader_label="Upload Annual Demand CSV or Excel",
+        table="demand_reference",
+        natural_key=("item_code", "warehouse_name"),
+        columns=(
+            Column("item_code", "Item Code"),
+            Column("warehouse_name", "Warehouse Name"),
+            Column("dem_qty_ref", "Demand Qty", "int"),
+        ),
+        checks={**NO_ITEM_CODE, **NO_WAREHOUSE},
+    ),
+}